@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Batch dispatch allocation for the Sock Factory Inventory Management System.
+
+Takes a whole batch of customer order lines, works out how much of each line
+can be filled from Ready Stock, and moves the filled quantities from Ready
+Stock to Dispatch in one transaction.
+
+When a variant has enough Ready Stock for every line asking for it, every
+line is filled. When it doesn't, the priority decides who gets what:
+- fifo: lines are filled in the order given until stock runs out
+- largest: the biggest lines are filled first
+- fair: max-min fair share - every line gets an equal share, lines that need
+  less than their share are filled and the rest is split among the others
+
+Ready Stock is read once, the plan is worked out per variant in memory, and
+the moves are written with one statement per table, so a batch of tens of
+thousands of lines is a single short transaction. Planning happens inside the
+same transaction as the moves, so no other terminal can change Ready Stock in
+between.
+
+Order files are CSV with the columns order_id, quality, color, size, quantity.
+
+Run with: python3 allocation.py ORDERS.csv [--priority fifo|largest|fair] [--dry-run]
+"""
+
+import argparse
+import csv
+import sqlite3
+import sys
+import time
+from collections import defaultdict
+
+from tabulate import tabulate
+
+import config
+
+PRIORITIES = ['fifo', 'largest', 'fair']
+
+# Stage orders are dispatched from, and the stage they go to
+SOURCE_STAGE = "Ready Stock"
+DESTINATION_STAGE = config.STAGE_TRANSITIONS[SOURCE_STAGE]
+
+# Short lines listed by print_plan() (all of them are still counted)
+SAMPLE_SIZE = 20
+
+
+def _validate(lines, priority):
+    """Check the order lines and priority before touching the database."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Invalid priority '{priority}', expected one of {', '.join(PRIORITIES)}")
+
+    for number, line in enumerate(lines, start=1):
+        for key in ('quality', 'color', 'size', 'quantity'):
+            if key not in line:
+                raise ValueError(f"Order line {number} is missing '{key}'")
+
+        quantity = line['quantity']
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity <= 0:
+            raise ValueError(f"Order line {number}: quantity must be a positive whole number, got {quantity!r}")
+
+def _split(available, demands, priority):
+    """
+    Split the available units of one variant between its order lines.
+
+    Args:
+        available (int): Units in Ready Stock
+        demands (list): Requested quantity per line, in the order given
+        priority (str): One of PRIORITIES
+
+    Returns:
+        list: Allocated quantity per line, in the same order as demands
+    """
+    if sum(demands) <= available:
+        return list(demands)
+
+    allocated = [0] * len(demands)
+
+    if priority == 'fair':
+        # Water-filling: smallest demands first, each capped at an equal
+        # share of what is left for the lines still waiting
+        order = sorted(range(len(demands)), key=demands.__getitem__)
+        remaining = available
+        for position, index in enumerate(order):
+            waiting = len(order) - position
+            share = remaining // waiting
+            if demands[index] <= share:
+                allocated[index] = demands[index]
+                remaining -= demands[index]
+                continue
+
+            # Every remaining line wants more than the share: give each the
+            # share, and the units that don't divide evenly to the earliest lines
+            rest = sorted(order[position:])
+            for rank, other in enumerate(rest):
+                allocated[other] = share + (1 if rank < remaining - share * waiting else 0)
+            break
+
+        return allocated
+
+    if priority == 'largest':
+        # Stable sort, so equal lines keep the order given
+        order = sorted(range(len(demands)), key=lambda index: -demands[index])
+    else:
+        order = range(len(demands))
+
+    remaining = available
+    for index in order:
+        if remaining == 0:
+            break
+        allocated[index] = min(demands[index], remaining)
+        remaining -= allocated[index]
+
+    return allocated
+
+def _plan(cursor, lines, priority):
+    """
+    Work out the fill plan against the Ready Stock visible to cursor.
+
+    Returns:
+        tuple: (plan lines, {variant_id: units to move})
+    """
+    cursor.execute("""
+        SELECT v.quality, v.color, v.size, v.variant_id, i.quantity
+        FROM inventory i
+        JOIN sock_variants v ON i.variant_id = v.variant_id
+        WHERE i.stage = ? AND i.quantity > 0
+    """, (SOURCE_STAGE,))
+    ready = {(quality, color, size): (variant_id, quantity)
+             for quality, color, size, variant_id, quantity in cursor}
+
+    # Line positions per variant, in the order given
+    by_variant = defaultdict(list)
+    for index, line in enumerate(lines):
+        by_variant[(line['quality'], line['color'], line['size'])].append(index)
+
+    allocated = [0] * len(lines)
+    variant_ids = [None] * len(lines)
+    moves = {}
+
+    for key, indexes in by_variant.items():
+        if key not in ready:
+            continue
+
+        variant_id, available = ready[key]
+        split = _split(available, [lines[index]['quantity'] for index in indexes], priority)
+        for index, quantity in zip(indexes, split):
+            allocated[index] = quantity
+            variant_ids[index] = variant_id
+
+        if sum(split):
+            moves[variant_id] = sum(split)
+
+    plan = [
+        {
+            'order_id': line.get('order_id'),
+            'quality': line['quality'],
+            'color': line['color'],
+            'size': line['size'],
+            'variant_id': variant_ids[index],
+            'requested': line['quantity'],
+            'allocated': allocated[index]
+        }
+        for index, line in enumerate(lines)
+    ]
+
+    return plan, moves
+
+def _apply(cursor, moves):
+    """Move the planned units from Ready Stock to Dispatch, inside the caller's transaction."""
+    now = time.time()
+
+    cursor.executemany("""
+        UPDATE inventory
+        SET quantity = quantity - ?
+        WHERE variant_id = ? AND stage = ?
+    """, [(quantity, variant_id, SOURCE_STAGE) for variant_id, quantity in moves.items()])
+
+    cursor.executemany("""
+        INSERT INTO inventory (variant_id, stage, quantity)
+        VALUES (?, ?, ?)
+        ON CONFLICT(variant_id, stage)
+        DO UPDATE SET
+            quantity = inventory.quantity + excluded.quantity
+    """, [(variant_id, DESTINATION_STAGE, quantity) for variant_id, quantity in moves.items()])
+
+    cursor.executemany("""
+        INSERT INTO stock_movements
+            (variant_id, from_stage, to_stage, quantity, action, moved_at)
+        VALUES (?, ?, ?, ?, 'move', ?)
+    """, [(variant_id, SOURCE_STAGE, DESTINATION_STAGE, quantity, now)
+          for variant_id, quantity in moves.items()])
+
+def dispatch_orders(lines, priority='fifo', dry_run=False):
+    """
+    Allocate Ready Stock to a batch of order lines and dispatch what was allocated.
+
+    Args:
+        lines (list): Order lines, each a dict with 'quality', 'color', 'size'
+            and 'quantity' (positive int), and optionally 'order_id'. For
+            'fifo' the list order is the order lines are served in.
+        priority (str): 'fifo', 'largest' or 'fair' (see module docstring)
+        dry_run (bool): Work out the plan without moving any stock
+
+    Returns:
+        dict: The fill plan and totals
+            {
+                'success': True,
+                'priority': str,
+                'dry_run': bool,
+                'lines': list,      # Per line: order_id, quality, color, size,
+                                    # variant_id, requested, allocated
+                'moves': dict,      # variant_id -> units moved to Dispatch
+                'requested': int,
+                'allocated': int,
+                'filled': int,      # Lines filled completely
+                'partial': int,     # Lines filled in part
+                'unfilled': int,    # Lines that got nothing
+                'seconds': float
+            }
+
+    Raises:
+        ValueError: If a line or the priority is invalid
+
+    Example:
+        >>> dispatch_orders([
+        ...     {'order_id': 'A1', 'quality': 'A', 'color': 'white', 'size': 'M', 'quantity': 60},
+        ...     {'order_id': 'A2', 'quality': 'A', 'color': 'white', 'size': 'M', 'quantity': 60}
+        ... ], priority='fair')  # with 100 white M in Ready Stock
+        {'success': True, 'allocated': 100, 'partial': 2, ...}
+    """
+    _validate(lines, priority)
+
+    start = time.perf_counter()
+    conn = sqlite3.connect(config.DB_PATH)
+    cursor = conn.cursor()
+
+    try:
+        # Take the write lock before reading Ready Stock, so the plan still
+        # holds when the moves are written
+        cursor.execute("BEGIN" if dry_run else "BEGIN IMMEDIATE")
+
+        plan, moves = _plan(cursor, lines, priority)
+
+        if dry_run:
+            conn.rollback()
+        else:
+            _apply(cursor, moves)
+            conn.commit()
+
+        return {
+            'success': True,
+            'priority': priority,
+            'dry_run': dry_run,
+            'lines': plan,
+            'moves': moves,
+            'requested': sum(line['requested'] for line in plan),
+            'allocated': sum(moves.values()),
+            'filled': sum(1 for line in plan if line['allocated'] == line['requested']),
+            'partial': sum(1 for line in plan if 0 < line['allocated'] < line['requested']),
+            'unfilled': sum(1 for line in plan if line['allocated'] == 0),
+            'seconds': time.perf_counter() - start
+        }
+
+    except Exception as e:
+        conn.rollback()
+        raise Exception(f"Failed to dispatch orders: {e}")
+
+    finally:
+        conn.close()
+
+def read_order_lines(path):
+    """
+    Read order lines from a CSV file with the columns order_id, quality, color,
+    size and quantity (order_id may be left out).
+
+    Raises:
+        ValueError: If a quantity isn't a whole number
+    """
+    lines = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for number, row in enumerate(csv.DictReader(f), start=2):  # Line 1 is the header
+            try:
+                row['quantity'] = int(row['quantity'])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f"{path} line {number}: quantity must be a whole number")
+            lines.append(row)
+    return lines
+
+def write_plan(path, result):
+    """Write the per-line fill plan of a dispatch_orders() result to a CSV file."""
+    columns = ['order_id', 'quality', 'color', 'size', 'variant_id', 'requested', 'allocated']
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(result['lines'])
+
+def print_plan(result):
+    """Print a dispatch_orders() result in a readable form."""
+    title = "Dispatch Plan (dry run)" if result['dry_run'] else "Dispatch"
+    print(f"\n=== {title}, {result['priority']} priority ===")
+
+    print(tabulate([
+        ["Lines filled", result['filled']],
+        ["Lines part-filled", result['partial']],
+        ["Lines not filled", result['unfilled']],
+        ["Units requested", result['requested']],
+        ["Units allocated", result['allocated']],
+        ["Variants dispatched", len(result['moves'])]
+    ], tablefmt="fancy_outline"))
+
+    short = [line for line in result['lines'] if line['allocated'] < line['requested']]
+    if short:
+        print("\nShort lines:")
+        print(tabulate(
+            [[line['order_id'] or "-", f"{line['quality']} {line['color']} {line['size']}",
+              line['requested'], line['allocated']] for line in short[:SAMPLE_SIZE]],
+            headers=["Order", "Sock", "Requested", "Allocated"],
+            tablefmt="fancy_outline"
+        ))
+        if len(short) > SAMPLE_SIZE:
+            print(f"... and {len(short) - SAMPLE_SIZE} more")
+
+    print(f"\nFinished in {result['seconds']:.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Dispatch a batch of orders from Ready Stock")
+    parser.add_argument('orders', help="CSV file with order_id, quality, color, size, quantity")
+    parser.add_argument('--priority', choices=PRIORITIES, default='fifo',
+                        help="Who is served first when stock is short (default: fifo)")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Show the plan without moving any stock")
+    parser.add_argument('--plan', metavar='FILE', help="Also write the per-line plan to a CSV file")
+    parser.add_argument('--db', help=f"Database to use (default: {config.DB_PATH})")
+    args = parser.parse_args()
+
+    if args.db:
+        config.DB_PATH = args.db
+
+    try:
+        result = dispatch_orders(read_order_lines(args.orders), args.priority, args.dry_run)
+    except Exception as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+
+    print_plan(result)
+    if args.plan:
+        write_plan(args.plan, result)
+        print(f"✓ Plan written to {args.plan}")
+
+if __name__ == "__main__":
+    main()
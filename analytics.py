@@ -0,0 +1,604 @@
+"""
+Flow analytics for the Sock Factory Inventory Management System.
+
+Works from the stock_movements ledger to answer where stock piles up along
+config.STAGES:
+- Throughput: units leaving each stage per day
+- Dwell time: how long units sit in each stage, matching departures to
+  arrivals first-in first-out
+- WIP: units sitting in each stage at the end of each day
+
+The whole ledger is loaded into NumPy arrays in one query and every
+calculation is done with array operations, never a Python loop over
+movements. The decoded ledger is kept in memory and (with
+config.ANALYTICS_CACHE_FILE) in files next to the database, so only new
+movements are read from SQLite once it has been loaded once. New movements
+are appended to a small delta file rather than rewriting the whole cache,
+which is only rewritten once the delta has grown large.
+"""
+
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+import numpy as np
+
+import config
+
+SECONDS_PER_DAY = 86400.0
+MINUTES_PER_DAY = 1440
+
+# Integer codes for stock_movements.action, in the order used by load_movements()
+ACTIONS = ['opening', 'add', 'move', 'undo', 'adjust']
+
+# One row per movement; from_stage/to_stage are indexes into config.STAGES, -1 for NULL
+MOVEMENT_DTYPE = np.dtype([
+    ('moved_at', np.float64),
+    ('variant_id', np.int64),
+    ('from_stage', np.int8),
+    ('to_stage', np.int8),
+    ('quantity', np.int64),
+    ('action', np.int8)
+])
+
+
+# Ledger already loaded by this process (see load_movements)
+_cache = None
+
+# Appended to config.DB_PATH for the ledger cache files: the base holds the
+# ledger as of its last rewrite, the delta the segments appended since
+CACHE_SUFFIX = '.flow-cache.npz'
+DELTA_SUFFIX = '.flow-cache.delta'
+
+# The delta is folded into a rewritten base once it has this many segments,
+# or this many rows per base row
+DELTA_MAX_SEGMENTS = 256
+DELTA_MAX_RATIO = 0.25
+
+# Written before each delta segment's rows: the id the segment carries on
+# from, the id of its last row, and its row count
+SEGMENT_HEADER_DTYPE = np.dtype([
+    ('after_id', np.int64),
+    ('last_id', np.int64),
+    ('rows', np.int64)
+])
+
+
+def _code_case(column, names):
+    """Return a SQL CASE expression mapping column values to their index in names plus one (0 otherwise)."""
+    whens = " ".join(f"WHEN '{name}' THEN {i + 1}" for i, name in enumerate(names))
+    return f"CASE {column} {whens} ELSE 0 END"
+
+def _fetch_movements(conn, after_id, last_id):
+    """
+    Fetch ledger rows with after_id < id <= last_id as a MOVEMENT_DTYPE array.
+
+    Stage and action codes are packed into one integer column next to the
+    variant id, so SQLite hands back three values per row instead of six.
+    """
+    raw = np.fromiter(
+        conn.execute(f"""
+            SELECT
+                moved_at,
+                (variant_id << 9)
+                    | ({_code_case('from_stage', config.STAGES)} << 6)
+                    | ({_code_case('to_stage', config.STAGES)} << 3)
+                    | ({_code_case('action', ACTIONS)} - 1),
+                quantity
+            FROM stock_movements
+            WHERE id > ? AND id <= ?
+            ORDER BY id
+        """, (after_id, last_id)),
+        dtype=[('moved_at', np.float64), ('packed', np.int64), ('quantity', np.int64)]
+    )
+
+    movements = np.empty(len(raw), dtype=MOVEMENT_DTYPE)
+    movements['moved_at'] = raw['moved_at']
+    movements['variant_id'] = raw['packed'] >> 9
+    movements['from_stage'] = ((raw['packed'] >> 6) & 7) - 1
+    movements['to_stage'] = ((raw['packed'] >> 3) & 7) - 1
+    movements['action'] = raw['packed'] & 7
+    movements['quantity'] = raw['quantity']
+    return movements
+
+def _new_cache(first_id, last_id, parts):
+    """
+    Build an in-memory cache from arrays of movements in ledger order.
+
+    Several arrays are copied into one buffer with room to spare, so new
+    movements can be appended later without copying the whole ledger each
+    time. A single array is used as it is, and only copied if rows are
+    appended to it.
+    """
+    count = sum(len(part) for part in parts)
+    cache = {
+        'db_path': config.DB_PATH,
+        'first_id': first_id,
+        'last_id': last_id,
+        'movements': parts[0] if len(parts) == 1 else
+                     np.empty(count + count // 8 + 1024, dtype=MOVEMENT_DTYPE),
+        'count': count,
+        # What the cache files hold, as far as this process knows
+        'file_last_id': None,
+        'base_rows': 0,
+        'delta_segments': 0,
+        'delta_rows': 0,
+        'delta_bytes': None  # None if the delta can't be appended to
+    }
+
+    if len(parts) > 1:
+        offset = 0
+        for part in parts:
+            cache['movements'][offset:offset + len(part)] = part
+            offset += len(part)
+
+    return cache
+
+def _append(cache, rows, last_id):
+    """Append new movements to an in-memory cache, growing its buffer when full."""
+    count = cache['count']
+    buffer = cache['movements']
+
+    if count + len(rows) > len(buffer):
+        grown = np.empty(max(count + len(rows), len(buffer) + len(buffer) // 4),
+                         dtype=MOVEMENT_DTYPE)
+        grown[:count] = buffer[:count]
+        cache['movements'] = buffer = grown
+
+    buffer[count:count + len(rows)] = rows
+    cache['count'] = count + len(rows)
+    cache['last_id'] = last_id
+
+def _read_delta(after_id):
+    """
+    Read the delta segments that carry on from after_id.
+
+    Returns:
+        tuple: (list of arrays, last id covered, bytes read). Bytes read is
+            None if the file has anything after the last usable segment (a
+            torn write, or segments that don't carry on from each other), so
+            it mustn't be appended to.
+    """
+    try:
+        with open(config.DB_PATH + DELTA_SUFFIX, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return [], after_id, 0
+
+    segments = []
+    offset = 0
+    while offset + SEGMENT_HEADER_DTYPE.itemsize <= len(data):
+        header = np.frombuffer(data, SEGMENT_HEADER_DTYPE, 1, offset)[0]
+        end = offset + SEGMENT_HEADER_DTYPE.itemsize + int(header['rows']) * MOVEMENT_DTYPE.itemsize
+        if header['after_id'] != after_id or header['rows'] <= 0 or end > len(data):
+            break
+
+        segments.append(np.frombuffer(data, MOVEMENT_DTYPE, int(header['rows']),
+                                      offset + SEGMENT_HEADER_DTYPE.itemsize))
+        after_id = int(header['last_id'])
+        offset = end
+
+    return segments, after_id, offset if offset == len(data) else None
+
+def _read_cache_file():
+    """Return the ledger cache stored next to config.DB_PATH, or None if there is none."""
+    if not config.ANALYTICS_CACHE_FILE:
+        return None
+
+    try:
+        with np.load(config.DB_PATH + CACHE_SUFFIX, allow_pickle=False) as data:
+            first_id, base_last_id = (int(value) for value in data['ids'])
+            base = data['movements']
+    except (OSError, KeyError, ValueError):
+        return None
+
+    try:
+        segments, last_id, delta_bytes = _read_delta(base_last_id)
+    except OSError:
+        segments, last_id, delta_bytes = [], base_last_id, None
+
+    cache = _new_cache(first_id, last_id, [base] + segments)
+    cache.update({
+        'file_last_id': last_id,
+        'base_rows': len(base),
+        'delta_segments': len(segments),
+        'delta_rows': cache['count'] - len(base),
+        'delta_bytes': delta_bytes
+    })
+    return cache
+
+def _write_cache_file(cache):
+    """
+    Rewrite the base cache file from the whole in-memory cache and start an
+    empty delta (skipped if it can't be written).
+    """
+    if not config.ANALYTICS_CACHE_FILE:
+        return
+
+    path = config.DB_PATH + CACHE_SUFFIX
+    try:
+        # Write to a temporary file and swap it in, so readers never see half a file
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, ids=np.array([cache['first_id'], cache['last_id']]),
+                     movements=cache['movements'][:cache['count']])
+        os.replace(path + '.tmp', path)
+
+        # Segments left over in the delta no longer carry on from the base,
+        # so readers would skip them anyway
+        if os.path.exists(config.DB_PATH + DELTA_SUFFIX):
+            os.remove(config.DB_PATH + DELTA_SUFFIX)
+    except OSError:
+        return  # The cache only saves time; the ledger is still read correctly without it
+
+    cache.update({
+        'file_last_id': cache['last_id'],
+        'base_rows': cache['count'],
+        'delta_segments': 0,
+        'delta_rows': 0,
+        'delta_bytes': 0
+    })
+
+def _append_cache_file(cache, rows, after_id):
+    """
+    Store movements just appended to the in-memory cache (the ids after
+    after_id) in the cache files.
+
+    They are added to the delta as one segment, unless the delta is due to
+    be folded into the base. If another process has written the files since
+    this one last did, they are left to it.
+    """
+    if not config.ANALYTICS_CACHE_FILE or cache['file_last_id'] != after_id:
+        return
+
+    path = config.DB_PATH + DELTA_SUFFIX
+    try:
+        delta_bytes = os.path.getsize(path)
+    except OSError:
+        delta_bytes = 0
+
+    if cache['delta_bytes'] is not None and delta_bytes != cache['delta_bytes']:
+        return
+
+    if (cache['delta_bytes'] is None
+            or cache['delta_segments'] + 1 > DELTA_MAX_SEGMENTS
+            or cache['delta_rows'] + len(rows) > cache['base_rows'] * DELTA_MAX_RATIO):
+        _write_cache_file(cache)
+        return
+
+    header = np.array([(after_id, cache['last_id'], len(rows))], dtype=SEGMENT_HEADER_DTYPE)
+    try:
+        # One write, so a reader sees the segment whole or (torn) skips it
+        with open(path, 'ab') as f:
+            f.write(header.tobytes() + rows.tobytes())
+    except OSError:
+        return
+
+    cache.update({
+        'file_last_id': cache['last_id'],
+        'delta_segments': cache['delta_segments'] + 1,
+        'delta_rows': cache['delta_rows'] + len(rows),
+        'delta_bytes': delta_bytes + SEGMENT_HEADER_DTYPE.itemsize + rows.nbytes
+    })
+
+def _cache_matches(conn, cache):
+    """
+    Check that a cache still describes the start of this database's ledger.
+
+    Ledger rows are never deleted or changed, so the cache is still good if
+    its first and last rows are still there with the same timestamps and no
+    earlier row has appeared. A restored backup or another database fails
+    this. Each lookup is by primary key, so the check doesn't scan the table.
+    """
+    cached = cache['movements'][:cache['count']]
+    if len(cached) == 0:
+        return False
+
+    first_id = conn.execute("SELECT MIN(id) FROM stock_movements").fetchone()[0]
+    if first_id != cache['first_id']:
+        return False
+
+    for movement_id, moved_at in ((cache['first_id'], cached['moved_at'][0]),
+                                  (cache['last_id'], cached['moved_at'][-1])):
+        row = conn.execute(
+            "SELECT moved_at FROM stock_movements WHERE id = ?", (movement_id,)
+        ).fetchone()
+        if row is None or row[0] != moved_at:
+            return False
+
+    return True
+
+def load_movements():
+    """
+    Load the whole stock_movements ledger into a NumPy structured array.
+
+    The ledger only ever grows, so the decoded result is kept for the life
+    of the process and, if config.ANALYTICS_CACHE_FILE is set, in files next
+    to the database. Later calls (from this or a new process) only fetch
+    rows added since, and append them to the cache without copying or
+    rewriting what is already there. If the ledger no longer matches the cache (a different
+    database, or a backup was restored) it is loaded again from scratch.
+
+    Returns:
+        numpy.ndarray: One element per movement in ledger order, with fields
+            moved_at, variant_id, from_stage, to_stage, quantity and action
+            (see MOVEMENT_DTYPE). Stage and action values are integer codes:
+            indexes into config.STAGES and ACTIONS, -1 for no stage.
+
+    Example:
+        >>> movements = load_movements()
+        >>> movements['quantity'][movements['action'] == ACTIONS.index('add')].sum()
+        12500  # Units ever added
+    """
+    global _cache
+
+    conn = sqlite3.connect(config.DB_PATH)
+
+    try:
+        # Separate queries: SQLite only answers a lone MIN() or MAX() from the index
+        first_id = conn.execute("SELECT COALESCE(MIN(id), 0) FROM stock_movements").fetchone()[0]
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM stock_movements").fetchone()[0]
+
+        cache = _cache if _cache is not None and _cache['db_path'] == config.DB_PATH else None
+        if cache is None:
+            cache = _read_cache_file()
+
+        if cache is not None and cache['last_id'] <= last_id and _cache_matches(conn, cache):
+            if last_id > cache['last_id']:
+                after_id = cache['last_id']
+                rows = _fetch_movements(conn, after_id, last_id)
+                _append(cache, rows, last_id)
+                _append_cache_file(cache, rows, after_id)
+        else:
+            cache = _new_cache(first_id, last_id, [_fetch_movements(conn, 0, last_id)])
+            if cache['count']:
+                _write_cache_file(cache)
+
+        _cache = cache
+        return cache['movements'][:cache['count']]
+
+    finally:
+        conn.close()
+
+def _day_index(moved_at, first_day):
+    """Return the local calendar day of each timestamp, counted from first_day."""
+    offset = datetime.now().astimezone().utcoffset().total_seconds()
+    return (np.floor((moved_at + offset) / SECONDS_PER_DAY) - first_day).astype(np.int64)
+
+def _day_range(movements):
+    """Return (first_day, day_count) covering all movements, in local days since the epoch."""
+    offset = datetime.now().astimezone().utcoffset().total_seconds()
+    days = np.floor((movements['moved_at'] + offset) / SECONDS_PER_DAY)
+    first_day = int(days.min())
+    return first_day, int(days.max()) - first_day + 1
+
+def stage_throughput(movements):
+    """
+    Count units moved out of each stage to the next, per day.
+
+    Undo is not counted: it removes stock rather than passing it on.
+
+    Args:
+        movements (numpy.ndarray): Output of load_movements()
+
+    Returns:
+        numpy.ndarray: Shape (len(config.STAGES), days) - units leaving each
+            stage on each day, day 0 being the first day in the ledger
+    """
+    stages = len(config.STAGES)
+    if len(movements) == 0:
+        return np.zeros((stages, 0), dtype=np.int64)
+
+    first_day, days = _day_range(movements)
+    moves = movements[movements['action'] == ACTIONS.index('move')]
+    day = _day_index(moves['moved_at'], first_day)
+
+    flat = np.bincount(
+        moves['from_stage'].astype(np.int64) * days + day,
+        weights=moves['quantity'],
+        minlength=stages * days
+    )
+    return flat.reshape(stages, days).astype(np.int64)
+
+def wip_trend(movements):
+    """
+    Units sitting in each stage at the end of each day.
+
+    Args:
+        movements (numpy.ndarray): Output of load_movements()
+
+    Returns:
+        numpy.ndarray: Shape (len(config.STAGES), days) - end-of-day WIP,
+            day 0 being the first day in the ledger
+    """
+    stages = len(config.STAGES)
+    if len(movements) == 0:
+        return np.zeros((stages, 0), dtype=np.int64)
+
+    first_day, days = _day_range(movements)
+    day = _day_index(movements['moved_at'], first_day)
+    quantity = movements['quantity']
+
+    net = np.zeros(stages * days)
+    entering = movements['to_stage'] >= 0
+    leaving = movements['from_stage'] >= 0
+    net += np.bincount(movements['to_stage'][entering].astype(np.int64) * days + day[entering],
+                       weights=quantity[entering], minlength=stages * days)
+    net -= np.bincount(movements['from_stage'][leaving].astype(np.int64) * days + day[leaving],
+                       weights=quantity[leaving], minlength=stages * days)
+
+    return np.cumsum(net.reshape(stages, days), axis=1).astype(np.int64)
+
+def dwell_times(movements):
+    """
+    FIFO-matched dwell time of units in each stage.
+
+    Within each (variant, stage), the first units to arrive are taken to be
+    the first to leave. Dwell time is measured for units that moved on to the
+    next stage. Units still in a stage have no dwell time yet.
+
+    How it works without a loop: arrivals of every (variant, stage) are laid
+    end to end on one number line of units, each group getting its own range.
+    Departures of a group are placed in the same range. The arrival and
+    departure cumulative totals then cut that line into segments. Each
+    segment is a run of units that share one arrival row and one departure
+    row. Its dwell is the departure time minus the arrival time, weighted by
+    the segment length.
+
+    Args:
+        movements (numpy.ndarray): Output of load_movements()
+
+    Returns:
+        dict: Mapping of stage name to dwell statistics (in days)
+            {'units': int, 'mean': float, 'p50': float, 'p90': float}
+            Stages nothing has left yet have units == 0 and NaN statistics.
+    """
+    stages = len(config.STAGES)
+    result = {
+        stage: {'units': 0, 'mean': np.nan, 'p50': np.nan, 'p90': np.nan}
+        for stage in config.STAGES
+    }
+
+    # Contiguous copies of the fields: gathering from the packed structured
+    # array (27-byte stride) is several times slower than from plain arrays
+    variant_id = np.ascontiguousarray(movements['variant_id'])
+    from_stage = np.ascontiguousarray(movements['from_stage'])
+    to_stage = np.ascontiguousarray(movements['to_stage'])
+    quantity = np.ascontiguousarray(movements['quantity'])
+    moved_at = np.ascontiguousarray(movements['moved_at'])
+    action = np.ascontiguousarray(movements['action'])
+
+    arrivals = np.flatnonzero(to_stage >= 0)
+    departures = np.flatnonzero(from_stage >= 0)
+    if len(arrivals) == 0 or len(departures) == 0:
+        return result
+
+    # Sort arrivals and departures by (variant, stage) group, keeping ledger
+    # (= time) order within a group. Appending the ledger position makes
+    # every key unique, so a plain sort is enough and the positions can be
+    # read back off the sorted keys.
+    rows = len(movements)
+    arr_sorted = np.sort(
+        (variant_id[arrivals] * stages + to_stage[arrivals]) * rows + arrivals
+    )
+    dep_sorted = np.sort(
+        (variant_id[departures] * stages + from_stage[departures]) * rows + departures
+    )
+    arr_key, arr_row = np.divmod(arr_sorted, rows)
+    dep_key, dep_row = np.divmod(dep_sorted, rows)
+
+    arr_qty, arr_time = quantity[arr_row], moved_at[arr_row]
+    dep_qty, dep_time, dep_action = quantity[dep_row], moved_at[dep_row], action[dep_row]
+
+    # Each group's range on the unit line: [group_start, group_end)
+    # (keys are sorted, so groups start wherever the key changes)
+    group_first = np.flatnonzero(np.r_[True, arr_key[1:] != arr_key[:-1]])
+    groups = arr_key[group_first]
+    arr_cum = np.cumsum(arr_qty)
+    group_end = arr_cum[np.r_[group_first[1:], len(arr_key)] - 1]
+    group_start = group_end - np.add.reduceat(arr_qty, group_first)
+
+    # Drop departures from groups with no arrivals, then lay the rest into their group's range
+    dep_group = np.searchsorted(groups, dep_key)
+    known = (dep_group < len(groups)) & (groups[np.minimum(dep_group, len(groups) - 1)] == dep_key)
+    dep_group, dep_qty = dep_group[known], dep_qty[known]
+    dep_time, dep_action = dep_time[known], dep_action[known]
+
+    dep_cum = np.cumsum(dep_qty)
+    dep_first = np.r_[True, dep_group[1:] != dep_group[:-1]]
+    before_group = np.maximum.accumulate(np.where(dep_first, dep_cum - dep_qty, 0))
+    # Clip so a group never departs more than arrived (e.g. stock from before the ledger)
+    dep_cum = np.minimum(dep_cum - before_group + group_start[dep_group], group_end[dep_group])
+
+    # Cut the unit line at every cumulative total; segment i is (cuts[i-1], cuts[i]]
+    cuts = np.sort(np.concatenate([arr_cum, dep_cum]), kind='stable')
+    cuts = cuts[np.r_[True, cuts[1:] != cuts[:-1]]]
+    width = np.diff(np.r_[0, cuts])
+
+    # Keep segments covered by a departure of their own group
+    group = np.searchsorted(group_end, cuts, side='left')
+    dep_index = np.searchsorted(dep_cum, cuts, side='left')
+    departed = dep_index < len(dep_cum)
+    dep_index = np.minimum(dep_index, len(dep_cum) - 1)
+    departed &= (dep_group[dep_index] == group) & (width > 0)
+    departed &= dep_action[dep_index] == ACTIONS.index('move')
+
+    arr_index = np.searchsorted(arr_cum, cuts[departed], side='left')
+    dwell = (dep_time[dep_index[departed]] - arr_time[arr_index]) / SECONDS_PER_DAY
+    weight = width[departed]
+    stage = (groups[group[departed]] % stages).astype(np.int64)
+
+    # Weighted percentiles per stage from a histogram of dwell times, to the minute
+    minutes = np.maximum(np.rint(dwell * MINUTES_PER_DAY).astype(np.int64), 0)
+    bins = int(minutes.max()) + 1 if len(minutes) else 1
+    histogram = np.bincount(stage * bins + minutes, weights=weight, minlength=stages * bins)
+    cumulative = np.cumsum(histogram.reshape(stages, bins), axis=1)
+    dwell_sum = np.bincount(stage, weights=dwell * weight, minlength=stages)
+
+    for code, name in enumerate(config.STAGES):
+        total = cumulative[code, -1]
+        if total == 0:
+            continue
+        result[name] = {
+            'units': int(total),
+            'mean': float(dwell_sum[code] / total),
+            'p50': float(np.searchsorted(cumulative[code], 0.5 * total) / MINUTES_PER_DAY),
+            'p90': float(np.searchsorted(cumulative[code], 0.9 * total) / MINUTES_PER_DAY)
+        }
+
+    return result
+
+def flow_report(days=30):
+    """
+    Per-stage flow summary and the likely bottleneck.
+
+    Args:
+        days (int): Number of most recent days to average throughput and
+            WIP over
+
+    Returns:
+        dict: {
+                'stages': list[dict],  # One row per stage, in config.STAGES order:
+                                       # stage, out_per_day, mean_wip, current_wip,
+                                       # dwell_mean, dwell_p50, dwell_p90 (days)
+                'bottleneck': str or None,  # Non-final stage with the longest mean dwell
+                'days': int,           # Days actually covered (<= days)
+                'movements': int,      # Ledger rows analysed
+                'seconds': float       # Time taken
+            }
+
+    Example:
+        >>> flow_report(days=7)['bottleneck']
+        'Sent for Press'
+    """
+    start = time.perf_counter()
+    movements = load_movements()
+
+    throughput = stage_throughput(movements)[:, -days:]
+    wip = wip_trend(movements)[:, -days:]
+    dwell = dwell_times(movements)
+    covered = throughput.shape[1]
+
+    rows = []
+    for code, stage in enumerate(config.STAGES):
+        rows.append({
+            'stage': stage,
+            'out_per_day': float(throughput[code].mean()) if covered else 0.0,
+            'mean_wip': float(wip[code].mean()) if covered else 0.0,
+            'current_wip': int(wip[code, -1]) if covered else 0,
+            'dwell_mean': dwell[stage]['mean'],
+            'dwell_p50': dwell[stage]['p50'],
+            'dwell_p90': dwell[stage]['p90']
+        })
+
+    # Final stage never moves on, so it can't be the bottleneck
+    candidates = [row for row in rows[:-1] if not np.isnan(row['dwell_mean'])]
+    bottleneck = max(candidates, key=lambda row: row['dwell_mean'])['stage'] if candidates else None
+
+    return {
+        'stages': rows,
+        'bottleneck': bottleneck,
+        'days': covered,
+        'movements': len(movements),
+        'seconds': time.perf_counter() - start
+    }
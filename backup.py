@@ -0,0 +1,306 @@
+"""
+Online backup and restore for the Sock Factory Inventory Management System.
+
+Backups are taken with SQLite's online backup API while the app is in use.
+Pages are copied a few at a time (config.BACKUP_PAGES_PER_STEP), so other
+terminals can keep writing. SQLite starts such a copy over whenever another
+connection commits, so if that happens more than config.BACKUP_MAX_RESTARTS
+times the copy is redone in a single step. Writers then wait for that one
+step (about a second per 300 MB), but it always finishes. The copy is then
+gzip-compressed and a SHA-256 checksum is written next to it in the same
+format as `sha256sum`, e.g.:
+
+    inventory-20250101-120000.db.gz
+    inventory-20250101-120000.db.gz.sha256
+
+Restore verifies the checksum and the database itself before copying it over
+config.DB_PATH.
+
+Run with: python3 backup.py backup [FILE] | restore FILE
+"""
+
+import argparse
+import gzip
+import hashlib
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import config
+
+# Read/write size when streaming files through gzip and hashlib
+CHUNK_SIZE = 1024 * 1024
+
+
+class _CopyRestarted(Exception):
+    """Raised from the backup progress callback to give up on a copy that keeps restarting."""
+
+def _copy_database(source, target):
+    """
+    Copy source into target with the online backup API.
+
+    Copies in steps while that works. Once other connections' commits have
+    restarted the copy more than config.BACKUP_MAX_RESTARTS times, copies
+    again in a single step, which commits can't restart.
+
+    Returns:
+        bool: True if the single-step fallback was needed
+    """
+    last_remaining = None
+    restarts = 0
+
+    def progress(status, remaining, total):
+        nonlocal last_remaining, restarts
+        # Remaining pages going back up means SQLite started the copy over
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+            if restarts > config.BACKUP_MAX_RESTARTS:
+                raise _CopyRestarted()
+        last_remaining = remaining
+
+    try:
+        source.backup(target, pages=config.BACKUP_PAGES_PER_STEP, progress=progress)
+        return False
+    except _CopyRestarted:
+        source.backup(target)
+        return True
+
+def _checksum_path(backup_path):
+    """Return the path of the checksum file that goes with backup_path."""
+    return backup_path + '.sha256'
+
+def default_backup_path():
+    """Return a timestamped backup path next to config.DB_PATH."""
+    folder = os.path.dirname(config.DB_PATH)
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    return os.path.join(folder, f"inventory-{stamp}.db.gz")
+
+def backup_database(backup_path=None):
+    """
+    Take a compressed, checksummed backup of the live database.
+
+    Args:
+        backup_path (str, optional): Where to write the .db.gz file.
+            Defaults to a timestamped file next to the database.
+
+    Returns:
+        dict: Information about the backup
+            {
+                'success': True,
+                'backup_path': str,
+                'checksum': str,
+                'database_bytes': int,
+                'backup_bytes': int,
+                'single_step': bool,  # True if writes forced the one-step copy
+                'seconds': float
+            }
+
+    Raises:
+        ValueError: If the database file does not exist
+
+    Example:
+        >>> backup_database('/backups/monday.db.gz')
+        {'success': True, 'backup_path': '/backups/monday.db.gz', ...}
+    """
+    if not os.path.exists(config.DB_PATH):
+        raise ValueError(f"Database not found: {config.DB_PATH}")
+
+    if backup_path is None:
+        backup_path = default_backup_path()
+
+    start = time.perf_counter()
+    folder = os.path.dirname(os.path.abspath(backup_path))
+
+    # Step 1: online copy into a plain temporary database file
+    fd, snapshot_path = tempfile.mkstemp(suffix='.db', dir=folder)
+    os.close(fd)
+
+    try:
+        source = sqlite3.connect(config.DB_PATH)
+        target = sqlite3.connect(snapshot_path)
+        try:
+            single_step = _copy_database(source, target)
+        finally:
+            target.close()
+            source.close()
+
+        # Step 2: compress and hash in a single streaming pass
+        digest = hashlib.sha256()
+        partial_path = backup_path + '.partial'
+
+        with open(snapshot_path, 'rb') as raw, open(partial_path, 'wb') as out:
+            with gzip.GzipFile(fileobj=_HashingWriter(out, digest), mode='wb',
+                               compresslevel=config.BACKUP_COMPRESSLEVEL) as gz:
+                shutil.copyfileobj(raw, gz, CHUNK_SIZE)
+
+        os.replace(partial_path, backup_path)
+
+        checksum = digest.hexdigest()
+        with open(_checksum_path(backup_path), 'w') as f:
+            f.write(f"{checksum}  {os.path.basename(backup_path)}\n")
+
+        return {
+            'success': True,
+            'backup_path': backup_path,
+            'checksum': checksum,
+            'database_bytes': os.path.getsize(snapshot_path),
+            'backup_bytes': os.path.getsize(backup_path),
+            'single_step': single_step,
+            'seconds': time.perf_counter() - start
+        }
+
+    finally:
+        os.remove(snapshot_path)
+        if os.path.exists(backup_path + '.partial'):
+            os.remove(backup_path + '.partial')
+
+def restore_database(backup_path):
+    """
+    Restore config.DB_PATH from a backup made by backup_database().
+
+    The backup is checked against its .sha256 file while it is decompressed,
+    then opened and run through PRAGMA integrity_check. Only a backup that
+    passes both is copied over the live database, in a single backup API step.
+
+    Args:
+        backup_path (str): Path to the .db.gz file
+
+    Returns:
+        dict: Information about the restore
+            {
+                'success': True,
+                'backup_path': str,
+                'checksum': str,
+                'seconds': float
+            }
+
+    Raises:
+        ValueError: If the backup or its checksum file is missing, the
+            checksum does not match, or the database fails integrity_check
+
+    Example:
+        >>> restore_database('/backups/monday.db.gz')
+        {'success': True, 'backup_path': '/backups/monday.db.gz', ...}
+    """
+    checksum_path = _checksum_path(backup_path)
+    if not os.path.exists(backup_path):
+        raise ValueError(f"Backup not found: {backup_path}")
+    if not os.path.exists(checksum_path):
+        raise ValueError(f"Checksum file not found: {checksum_path}")
+
+    with open(checksum_path) as f:
+        expected = f.read().split()[0].lower()
+
+    start = time.perf_counter()
+    folder = os.path.dirname(os.path.abspath(config.DB_PATH))
+
+    fd, restore_path = tempfile.mkstemp(suffix='.db', dir=folder)
+    os.close(fd)
+
+    try:
+        # Step 1: decompress and hash in a single streaming pass
+        digest = hashlib.sha256()
+        with open(backup_path, 'rb') as raw, open(restore_path, 'wb') as out:
+            with gzip.GzipFile(fileobj=_HashingReader(raw, digest), mode='rb') as gz:
+                shutil.copyfileobj(gz, out, CHUNK_SIZE)
+
+        checksum = digest.hexdigest()
+        if checksum != expected:
+            raise ValueError(
+                f"Checksum mismatch for {backup_path}: "
+                f"expected {expected}, got {checksum}"
+            )
+
+        # Step 2: make sure the decompressed file is a healthy database
+        source = sqlite3.connect(restore_path)
+        try:
+            result = source.execute("PRAGMA integrity_check").fetchone()[0]
+            if result != 'ok':
+                raise ValueError(f"Backup failed integrity check: {result}")
+
+            # Step 3: copy over the live database in one step
+            target = sqlite3.connect(config.DB_PATH)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+        finally:
+            source.close()
+
+        return {
+            'success': True,
+            'backup_path': backup_path,
+            'checksum': checksum,
+            'seconds': time.perf_counter() - start
+        }
+
+    finally:
+        os.remove(restore_path)
+
+
+class _HashingWriter:
+    """File wrapper that feeds everything written through it into a hash."""
+
+    def __init__(self, f, digest):
+        self.f = f
+        self.digest = digest
+
+    def write(self, data):
+        self.digest.update(data)
+        return self.f.write(data)
+
+    def flush(self):
+        self.f.flush()
+
+
+class _HashingReader:
+    """File wrapper that feeds everything read through it into a hash."""
+
+    def __init__(self, f, digest):
+        self.f = f
+        self.digest = digest
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.digest.update(data)
+        return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Back up or restore the inventory database")
+    parser.add_argument('--db', help=f"Database to use (default: {config.DB_PATH})")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    backup_parser = commands.add_parser('backup', help="Write a compressed, checksummed backup")
+    backup_parser.add_argument('file', nargs='?',
+                               help="Backup file (default: timestamped file next to the database)")
+
+    restore_parser = commands.add_parser('restore', help="Replace the database with a backup")
+    restore_parser.add_argument('file')
+
+    args = parser.parse_args()
+    if args.db:
+        config.DB_PATH = args.db
+
+    try:
+        if args.command == 'backup':
+            result = backup_database(args.file)
+        else:
+            result = restore_database(args.file)
+    except Exception as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+
+    if args.command == 'backup':
+        print(f"✓ Backup written to {result['backup_path']}")
+        print(f"  {result['database_bytes']} bytes -> {result['backup_bytes']} bytes "
+              f"in {result['seconds']:.2f}s")
+        print(f"  SHA-256: {result['checksum']}")
+    else:
+        print(f"✓ Restored from {result['backup_path']} in {result['seconds']:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,610 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Sock Factory Inventory Management System.
+
+Each benchmark builds its own throwaway database in a temporary directory,
+so it never touches the real inventory.db.
+
+Run with: python3 benchmark.py [name ...]   (no names runs everything)
+"""
+
+import multiprocessing
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import allocation
+import analytics
+import backup
+import config
+import dashboard
+import database
+import integrity
+import main as cli
+import transfer
+
+
+def use_database(path):
+    """Point config.DB_PATH at path and make sure the schema exists."""
+    config.DB_PATH = path
+    database.init_database()
+
+def seed_inventory(variants):
+    """Add stock for `variants` variants and spread some of it across stages."""
+    for i in range(variants):
+        database.add_stock(f"Q{i % 5}", f"color{i % 37}", f"S{i}", 1000)
+        database.move_stock(i + 1, 'Order', 400)
+        database.move_stock(i + 1, 'Raw Made', 200)
+
+def percentile(samples, pct):
+    """Return the pct-th percentile of samples (nearest rank)."""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def report(label, samples):
+    """Print count and latency percentiles (samples are in seconds)."""
+    print(
+        f"  {label:<32} n={len(samples):<6}"
+        f" p50={percentile(samples, 50) * 1000:8.2f}ms"
+        f" p95={percentile(samples, 95) * 1000:8.2f}ms"
+        f" p99={percentile(samples, 99) * 1000:8.2f}ms"
+    )
+
+
+# --- Read snapshot -----------------------------------------------------------
+
+def _snapshot_writer(path, variants, stop):
+    """Keep committing small writes until stop is set."""
+    config.DB_PATH = path
+    rng = random.Random(os.getpid())
+    while not stop.is_set():
+        i = rng.randrange(variants)
+        try:
+            database.add_stock(f"Q{i % 5}", f"color{i % 37}", f"S{i}", 1)
+        except Exception:
+            pass
+
+def _paced_writer(path, interval, stop, results):
+    """Commit one small write every `interval` seconds until stop is set, report write latencies."""
+    config.DB_PATH = path
+    latencies = []
+    errors = 0
+    n = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            database.add_stock('Q0', 'paced', f"S{n % 100}", 1)
+            latencies.append(time.perf_counter() - start)
+        except Exception:
+            errors += 1
+        n += 1
+        time.sleep(interval)
+    results.put((latencies, errors))
+
+class PacedWriter:
+    """Context manager running _paced_writer in another process (like a busy terminal)."""
+
+    def __init__(self, path, interval=0.05):
+        self.stop = multiprocessing.Event()
+        self.results = multiprocessing.Queue()
+        self.proc = multiprocessing.Process(
+            target=_paced_writer, args=(path, interval, self.stop, self.results)
+        )
+        self.latencies = []
+        self.errors = 0
+
+    def __enter__(self):
+        self.proc.start()
+        time.sleep(0.2)  # Let it get going
+        return self
+
+    def __exit__(self, *exc):
+        self.stop.set()
+        self.latencies, self.errors = self.results.get()
+        self.proc.join()
+
+def _time_reads(duration):
+    """Call the View Mode read functions for `duration` seconds, return latencies."""
+    samples = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        database.get_stock_summary()
+        database.get_all_inventory()
+        database.filter_inventory(color="color3")
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def bench_snapshot(variants=2000, writers=2, duration=3.0, large_mb=100):
+    """Reader latency under concurrent write load, with and without the snapshot."""
+    print(f"\nsnapshot: {variants} variants, {writers} concurrent writers, {duration}s per mode")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'inventory.db')
+        use_database(path)
+        seed_inventory(variants)
+
+        stop = multiprocessing.Event()
+        procs = [
+            multiprocessing.Process(target=_snapshot_writer, args=(path, variants, stop))
+            for _ in range(writers)
+        ]
+        for proc in procs:
+            proc.start()
+
+        try:
+            report("direct reads", _time_reads(duration))
+
+            database.enable_snapshot(auto_refresh=False)
+            report("snapshot (manual refresh)", _time_reads(duration))
+
+            start = time.perf_counter()
+            database.refresh_snapshot(force=True)
+            print(f"  {'snapshot refresh':<32} {(time.perf_counter() - start) * 1000:.2f}ms")
+
+            database.enable_snapshot(auto_refresh=True)
+            report("snapshot (auto refresh)", _time_reads(duration))
+        finally:
+            database.disable_snapshot()
+            stop.set()
+            for proc in procs:
+                proc.join()
+
+        # A larger database with a writer committing every 50ms: the copy
+        # must still finish (a stepped copy restarts on every commit)
+        path = os.path.join(tmp, 'large.db')
+        use_database(path)
+        size = grow_database(large_mb)
+        print(f"  {'large database':<32} {size / 1024 / 1024:8.0f} MB, writer committing every 50ms")
+
+        with PacedWriter(path) as writer:
+            start = time.perf_counter()
+            database.enable_snapshot(auto_refresh=False)
+            print(f"  {'enable_snapshot':<32} {(time.perf_counter() - start) * 1000:8.2f}ms")
+            start = time.perf_counter()
+            database.refresh_snapshot(force=True)
+            print(f"  {'refresh_snapshot':<32} {(time.perf_counter() - start) * 1000:8.2f}ms")
+            database.disable_snapshot()
+        report("writer latency meanwhile", writer.latencies)
+
+
+# --- Backup and restore ------------------------------------------------------
+
+def bulk_seed(conn, variants):
+    """Bulk-insert `variants` new variants with a row at every stage (no commit)."""
+    start = conn.execute("SELECT COALESCE(MAX(variant_id), 0) FROM sock_variants").fetchone()[0]
+    conn.execute("""
+        WITH RECURSIVE n(i) AS (
+            SELECT ? + 1 UNION ALL SELECT i + 1 FROM n WHERE i < ? + ?
+        )
+        INSERT INTO sock_variants (variant_id, quality, color, size)
+        SELECT i, 'Q' || (i % 5), 'color-' || (i % 997) || '-' || hex(randomblob(8)), 'S' || i
+        FROM n
+    """, (start, start, variants))
+    conn.execute("""
+        INSERT INTO inventory (variant_id, stage, quantity)
+        SELECT variant_id, stage, abs(random() % 1000)
+        FROM sock_variants, (SELECT 'Order' AS stage UNION ALL SELECT 'Raw Made'
+            UNION ALL SELECT 'Sent for Press' UNION ALL SELECT 'Ready Stock'
+            UNION ALL SELECT 'Dispatch')
+        WHERE variant_id > ?
+    """, (start,))
+
+def grow_database(size_mb, batch=200000):
+    """Bulk-insert variants until the file reaches size_mb, return its size in bytes."""
+    conn = sqlite3.connect(config.DB_PATH)
+    target = size_mb * 1024 * 1024
+    try:
+        while True:
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            if page_count * page_size >= target:
+                return page_count * page_size
+
+            bulk_seed(conn, batch)
+            conn.commit()
+    finally:
+        conn.close()
+
+def bench_backup(size_mb=1024):
+    """Online backup and verified restore timings for a size_mb database."""
+    print(f"\nbackup: {size_mb} MB database")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_database(os.path.join(tmp, 'inventory.db'))
+
+        start = time.perf_counter()
+        size = grow_database(size_mb)
+        print(f"  {'build database':<32} {time.perf_counter() - start:8.2f}s ({size / 1024 / 1024:.0f} MB)")
+
+        result = backup.backup_database(os.path.join(tmp, 'backup.db.gz'))
+        print(f"  {'backup (idle, compressed)':<32} {result['seconds']:8.2f}s"
+              f" ({result['backup_bytes'] / 1024 / 1024:.0f} MB on disk)")
+
+        # Another terminal committing every 50ms restarts a stepped copy
+        # each time; the backup must still finish
+        with PacedWriter(config.DB_PATH) as writer:
+            busy = backup.backup_database(os.path.join(tmp, 'busy.db.gz'))
+        print(f"  {'backup (writer every 50ms)':<32} {busy['seconds']:8.2f}s"
+              f" (single-step fallback: {busy['single_step']})")
+        report(f"writer latency ({writer.errors} failed)", writer.latencies)
+
+        result = backup.restore_database(result['backup_path'])
+        print(f"  {'restore (verified)':<32} {result['seconds']:8.2f}s")
+
+
+# --- Multi-site reports ------------------------------------------------------
+
+def _time_call(func, repeat):
+    """Call func `repeat` times and return the latencies."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def bench_sites(variants=100000, shard_counts=(1, 2, 4, 8), repeat=10):
+    """All-sites summary and filter latency as shards are added."""
+    # Sites are queried on parallel threads, so flat scaling needs a CPU per site
+    print(f"\nsites: {variants} variants per site, {os.cpu_count()} CPU(s)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {}
+        for n in range(max(shard_counts)):
+            path = os.path.join(tmp, f'site{n}.db')
+            use_database(path)
+            conn = sqlite3.connect(path)
+            bulk_seed(conn, variants)
+            conn.commit()
+            conn.close()
+            paths[f'Site {n}'] = path
+
+        for count in shard_counts:
+            config.SITES = dict(list(paths.items())[:count])
+            report(f"summary, {count} site(s)", _time_call(database.get_site_stock_summary, repeat))
+            report(f"filter, {count} site(s)",
+                   _time_call(lambda: database.filter_site_inventory(quality='Q1', size='S5'), repeat))
+
+        config.SITES = {}
+
+
+# --- Live dashboard ----------------------------------------------------------
+
+def bench_dashboard(variants=20000, polls=10000, repeat=50):
+    """Cost of an idle dashboard poll and of an incremental vs full refresh."""
+    print(f"\ndashboard: {variants} variants")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_database(os.path.join(tmp, 'inventory.db'))
+        conn = sqlite3.connect(config.DB_PATH)
+        bulk_seed(conn, variants)
+        conn.commit()
+        database.add_stock('Q0', 'color0', 'S1', 1)
+
+        start_cpu = time.process_time()
+        start = time.perf_counter()
+        for _ in range(polls):
+            conn.execute("PRAGMA data_version").fetchone()
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - start_cpu
+        print(f"  {'idle poll (data_version)':<32} {elapsed / polls * 1e6:8.2f}us wall,"
+              f" {cpu / polls * 1e6:.2f}us CPU per poll")
+
+        state = dashboard.load_state(conn)
+        incremental = []
+        for _ in range(repeat):
+            database.add_stock('Q0', 'color0', 'S1', 1)
+            start = time.perf_counter()
+            state = dashboard.refresh_state(state, conn)
+            dashboard.render(state)
+            incremental.append(time.perf_counter() - start)
+        report("incremental refresh + render", incremental)
+
+        report("full reload + render",
+               _time_call(lambda: dashboard.render(dashboard.load_state(conn)), repeat))
+        conn.close()
+
+
+# --- Flow analytics ----------------------------------------------------------
+
+def seed_history(conn, variants, days, batches_per_variant):
+    """Write a synthetic ledger: each batch is added, then moved through every stage."""
+    rng = random.Random(0)
+    now = time.time()
+    start = now - days * 86400
+    stage_names = config.STAGES
+    rows = []
+
+    for variant_id in range(1, variants + 1):
+        for _ in range(batches_per_variant):
+            t = start + rng.random() * days * 86400
+            quantity = rng.randint(10, 500)
+            rows.append((variant_id, None, stage_names[0], quantity, 'add', t))
+            for source, target in zip(stage_names, stage_names[1:]):
+                t += rng.expovariate(1 / 86400)  # About a day per stage
+                if t > now:
+                    break
+                rows.append((variant_id, source, target, quantity, 'move', t))
+
+    rows.sort(key=lambda row: row[5])
+    conn.executemany("""
+        INSERT INTO stock_movements
+            (variant_id, from_stage, to_stage, quantity, action, moved_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+    return len(rows)
+
+def bench_analytics(variants=5000, days=365, batches_per_variant=52, repeat=5):
+    """Load a year of movement history and compute throughput, WIP and dwell."""
+    print(f"\nanalytics: {variants} variants, {days} days, {batches_per_variant} batches per variant")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_database(os.path.join(tmp, 'inventory.db'))
+        conn = sqlite3.connect(config.DB_PATH)
+        rows = seed_history(conn, variants, days, batches_per_variant)
+        conn.close()
+        print(f"  {'ledger rows':<32} {rows}")
+
+        cache_files = [config.DB_PATH + analytics.CACHE_SUFFIX,
+                       config.DB_PATH + analytics.DELTA_SUFFIX]
+
+        def cold_load():
+            analytics._cache = None
+            for path in cache_files:
+                if os.path.exists(path):
+                    os.remove(path)
+            return analytics.load_movements()
+
+        def new_process_load():
+            analytics._cache = None  # As in a new process: only the cache file is left
+            return analytics.load_movements()
+
+        report("load_movements (cold)", _time_call(cold_load, repeat))
+        report("load_movements (cache file)", _time_call(new_process_load, repeat))
+        report("load_movements (in memory)", _time_call(analytics.load_movements, repeat))
+        movements = analytics.load_movements()
+        report("stage_throughput", _time_call(lambda: analytics.stage_throughput(movements), repeat))
+        report("wip_trend", _time_call(lambda: analytics.wip_trend(movements), repeat))
+        report("dwell_times", _time_call(lambda: analytics.dwell_times(movements), repeat))
+        report("flow_report (in memory)", _time_call(analytics.flow_report, repeat))
+
+        def new_process_report():
+            analytics._cache = None
+            return analytics.flow_report()
+
+        report("flow_report (cache file)", _time_call(new_process_report, repeat))
+
+        # Other terminals keep writing, so most reports see a few new rows
+        def report_after_write(new_process):
+            database.add_stock('Q0', 'color1', 'M', 1)
+            if new_process:
+                analytics._cache = None
+            return analytics.flow_report()
+
+        report("flow_report (new rows)", _time_call(lambda: report_after_write(False), repeat))
+        report("flow_report (new rows, restart)",
+               _time_call(lambda: report_after_write(True), repeat))
+
+
+# --- Integrity checks --------------------------------------------------------
+
+def bench_integrity(variants=5000, days=365, batches_per_variant=52, touched=50):
+    """Full vs incremental integrity check over a year of ledger history."""
+    print(f"\nintegrity: {variants} variants, {days} days of history")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_database(os.path.join(tmp, 'inventory.db'))
+        conn = sqlite3.connect(config.DB_PATH)
+        rows = seed_history(conn, variants, days, batches_per_variant)
+
+        # Make sock_variants and inventory agree with the synthetic ledger
+        conn.execute("""
+            INSERT INTO sock_variants (variant_id, quality, color, size)
+            SELECT DISTINCT variant_id, 'Q' || (variant_id % 5), 'color' || variant_id, 'M'
+            FROM stock_movements
+        """)
+        conn.execute("""
+            INSERT INTO inventory (variant_id, stage, quantity)
+            SELECT variant_id, stage, SUM(quantity) FROM (
+                SELECT variant_id, to_stage AS stage, quantity FROM stock_movements
+                WHERE to_stage IS NOT NULL
+                UNION ALL
+                SELECT variant_id, from_stage, -quantity FROM stock_movements
+                WHERE from_stage IS NOT NULL
+            )
+            GROUP BY variant_id, stage
+        """)
+        conn.commit()
+        conn.close()
+        print(f"  {'ledger rows':<32} {rows}")
+
+        result = integrity.check_integrity()
+        print(f"  {'full check':<32} {result['seconds'] * 1000:8.2f}ms (ok={result['ok']})")
+
+        for n in range(touched):
+            database.add_stock('Q0', f'color{n + 1}', 'M', 1)
+
+        result = integrity.check_integrity(incremental=True)
+        print(f"  {'incremental check':<32} {result['seconds'] * 1000:8.2f}ms"
+              f" ({result['variants_checked']} variants, ok={result['ok']})")
+
+        # Edits made outside the app are found through the change triggers
+        conn = sqlite3.connect(config.DB_PATH)
+        conn.execute("UPDATE inventory SET quantity = quantity + 1 WHERE variant_id <= ?", (touched,))
+        conn.commit()
+        conn.close()
+
+        result = integrity.check_integrity(incremental=True)
+        print(f"  {'incremental after SQL edits':<32} {result['seconds'] * 1000:8.2f}ms"
+              f" ({result['variants_checked']} variants, {result['remaining']} problems)")
+
+
+# --- Export / import ---------------------------------------------------------
+
+def _peak_rss_mb():
+    """Peak resident memory of this process in MB (VmHWM, reset by exec unlike ru_maxrss)."""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _transfer_child(db_path, func, args, results):
+    """Run a transfer function in this (child) process and report its peak memory."""
+    config.DB_PATH = db_path
+    result = func(*args)
+    results.put((result['seconds'], _peak_rss_mb()))
+
+def _run_transfer(db_path, func, *args):
+    """Run func in a fresh process so its peak RSS isn't mixed up with ours."""
+    # Spawn, not fork: a forked child would inherit (and report) our memory
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    proc = context.Process(target=_transfer_child, args=(db_path, func, args, results))
+    proc.start()
+    seconds, peak_mb = results.get()
+    proc.join()
+    return seconds, peak_mb
+
+def bench_transfer(variants=5000, days=365, batches_per_variant=52):
+    """Export and import a year of history in both formats, with peak memory."""
+    print(f"\ntransfer: {variants} variants, {days} days of history")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'source.db')
+        use_database(source)
+        conn = sqlite3.connect(source)
+        rows = seed_history(conn, variants, days, batches_per_variant)
+        bulk_seed(conn, variants)
+        conn.commit()
+        conn.close()
+        print(f"  {'ledger rows':<32} {rows}")
+
+        for fmt, name in (('jsonl', 'export.jsonl'), ('jsonl', 'export.jsonl.gz'),
+                          ('columnar', 'export.sockcol')):
+            path = os.path.join(tmp, name)
+            seconds, peak = _run_transfer(source, transfer.export_database, path, fmt)
+            size = os.path.getsize(path) / 1024 / 1024
+            print(f"  {'export ' + name:<32} {seconds:8.2f}s  {size:7.1f} MB file  peak RSS {peak:.0f} MB")
+
+            target = os.path.join(tmp, name + '.db')
+            seconds, peak = _run_transfer(target, transfer.import_database, path)
+            print(f"  {'import ' + name:<32} {seconds:8.2f}s  {'':15} peak RSS {peak:.0f} MB")
+
+
+# --- Dispatch allocation -------------------------------------------------------
+
+def bench_dispatch(variants=5000, lines=50000, baseline_lines=1000):
+    """Allocate a large order batch against Ready Stock, vs. one move_stock per line."""
+    print(f"\ndispatch: {lines} order lines over {variants} variants")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rng = random.Random(42)
+        for priority in allocation.PRIORITIES:
+            use_database(os.path.join(tmp, f'{priority}.db'))
+            conn = sqlite3.connect(config.DB_PATH)
+            bulk_seed(conn, variants)
+            conn.commit()
+            keys = conn.execute("SELECT quality, color, size FROM sock_variants").fetchall()
+            conn.close()
+
+            # Demand is about equal to Ready Stock overall, so many variants run short
+            orders = [
+                dict(zip(('quality', 'color', 'size'), rng.choice(keys)),
+                     order_id=f"O{n}", quantity=rng.randint(1, 100))
+                for n in range(lines)
+            ]
+
+            plan = allocation.dispatch_orders(orders, priority, dry_run=True)
+            print(f"  {priority + ' plan (dry run)':<32} {plan['seconds'] * 1000:8.2f}ms"
+                  f"  ({plan['allocated']}/{plan['requested']} units)")
+
+            result = allocation.dispatch_orders(orders, priority)
+            print(f"  {priority + ' plan + apply':<32} {result['seconds'] * 1000:8.2f}ms"
+                  f"  ({len(result['moves'])} variants moved)")
+
+        # Baseline: the same kind of work done one move_stock call per line
+        use_database(os.path.join(tmp, 'baseline.db'))
+        conn = sqlite3.connect(config.DB_PATH)
+        bulk_seed(conn, variants)
+        conn.commit()
+        ready = conn.execute(
+            "SELECT variant_id FROM inventory WHERE stage = 'Ready Stock' AND quantity > 0"
+        ).fetchall()
+        conn.close()
+
+        start = time.perf_counter()
+        for n in range(baseline_lines):
+            database.move_stock(ready[n % len(ready)][0], 'Ready Stock', 1)
+        per_line = (time.perf_counter() - start) / baseline_lines
+        print(f"  {'move_stock per line':<32} {per_line * 1000:8.2f}ms"
+              f"  (~{per_line * lines:.1f}s for {lines} lines)")
+
+
+# --- Scripted CLI / batch mode ----------------------------------------------------
+
+def bench_batch(operations=5000, per_process=20):
+    """A batch file run in one process vs. one main.py process per operation."""
+    print(f"\nbatch: {operations} operations")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_database(os.path.join(tmp, 'inventory.db'))
+
+        rng = random.Random(7)
+        lines = []
+        for n in range(operations):
+            color = f"color{n if n < 50 else rng.randrange(50)}"  # Every color exists before it moves
+            if n < 50 or rng.random() < 0.5:
+                lines.append(f"add A {color} M {rng.randint(10, 100)}")
+            else:
+                lines.append(f"move A {color} M Order 1")
+        path = os.path.join(tmp, 'operations.txt')
+        with open(path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+
+        result = cli.run_batch(path, quiet=True)
+        times = [seconds for _, _, ok, seconds in result['operations'] if ok]
+        report(f"batch ({len(times)} ok)", times)
+        print(f"  {'batch wall time':<32} {result['seconds']:8.2f}s")
+
+        # Baseline: what a shell loop calling main.py once per operation costs
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+        start = time.perf_counter()
+        for line in lines[:per_process]:
+            subprocess.run([sys.executable, script, '--db', config.DB_PATH] + line.split(),
+                           stdout=subprocess.DEVNULL, check=True)
+        per_op = (time.perf_counter() - start) / per_process
+        print(f"  {'one process per operation':<32} {per_op * 1000:8.2f}ms"
+              f"  (~{per_op * operations:.0f}s for {operations})")
+
+
+BENCHMARKS = {
+    'snapshot': bench_snapshot,
+    'backup': bench_backup,
+    'sites': bench_sites,
+    'dashboard': bench_dashboard,
+    'analytics': bench_analytics,
+    'integrity': bench_integrity,
+    'transfer': bench_transfer,
+    'dispatch': bench_dispatch,
+    'batch': bench_batch,
+}
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark: {name} (choose from {', '.join(BENCHMARKS)})")
+            sys.exit(1)
+        BENCHMARKS[name]()
+
+if __name__ == "__main__":
+    main()
@@ -23,3 +23,34 @@ STAGE_TRANSITIONS = {
     "Ready Stock": "Dispatch",
     "Dispatch": None  # Final stage, no next stage
 }
+
+# Read snapshot settings (see database.enable_snapshot)
+# When enabled, View Mode reads run against an in-memory copy of the database
+READ_SNAPSHOT = False
+
+# Online backup settings (see backup.py)
+# Pages copied per backup step; writers can commit between steps
+BACKUP_PAGES_PER_STEP = 1024
+# Times other terminals' commits may restart the stepped copy before it is
+# redone in a single step (writers wait for that step instead)
+BACKUP_MAX_RESTARTS = 3
+# gzip level for backup files (1 = fastest, 9 = smallest)
+BACKUP_COMPRESSLEVEL = 1
+
+# Multi-site databases: site name -> path to that site's inventory.db
+# Used by the all-sites reports (database.get_site_stock_summary etc.).
+# Leave empty to report on DB_PATH alone.
+# Example: SITES = {"Unit 1": "/data/unit1/inventory.db", "Unit 2": "/data/unit2/inventory.db"}
+SITES = {}
+
+# Live dashboard settings (see dashboard.py)
+# Seconds between change checks; each check is a single PRAGMA data_version
+DASHBOARD_POLL_INTERVAL = 1.0
+# Number of recent movements shown under the stage summary
+DASHBOARD_RECENT_MOVEMENTS = 10
+
+# Flow analytics (see analytics.py)
+# Keep the decoded movement ledger in a file next to the database
+# (DB_PATH + '.flow-cache.npz'), so a new process only reads the movements
+# added since the last report instead of the whole ledger
+ANALYTICS_CACHE_FILE = True
@@ -0,0 +1,219 @@
+"""
+Live dashboard for the Sock Factory Inventory Management System.
+
+Shows the stage summary and the most recent stock movements, and keeps them
+up to date in place until Ctrl+C is pressed.
+
+The dashboard is cheap to leave running:
+- Changes are detected by polling PRAGMA data_version on one open connection,
+  which only reads the database header. Nothing else runs while the
+  database is unchanged.
+- When the database has changed, only the stock_movements rows newer than
+  the last one seen are fetched, and their quantities are applied to the
+  summary already on screen.
+- Only the screen lines whose text changed are rewritten.
+"""
+
+import os
+import sqlite3
+import sys
+import time
+from collections import deque
+from datetime import datetime
+
+from tabulate import tabulate
+
+import config
+import database
+
+
+def load_state(conn):
+    """
+    Load everything the dashboard shows from scratch.
+
+    The summary, the recent movements and the highest movement id are read
+    in one read transaction, so they all describe the same moment: a commit
+    can't be counted in the summary and then applied again as a new movement.
+
+    Args:
+        conn (sqlite3.Connection): The dashboard's connection
+
+    Returns:
+        dict: Dashboard state
+            {
+                'summary': dict,     # Same format as get_stock_summary()
+                'recent': deque,     # Latest movements, oldest first
+                'last_id': int,      # Highest movement id seen
+                'last_moved_at': float,  # Its moved_at (None if no movements)
+                'updated_at': float  # When the state last changed
+            }
+    """
+    conn.execute("BEGIN")
+    try:
+        summary = database.get_stock_summary(conn=conn)
+        recent = deque(
+            database.get_movements_since(0, limit=config.DASHBOARD_RECENT_MOVEMENTS, conn=conn),
+            maxlen=config.DASHBOARD_RECENT_MOVEMENTS
+        )
+        last_id, last_moved_at = conn.execute("""
+            SELECT id, moved_at FROM stock_movements ORDER BY id DESC LIMIT 1
+        """).fetchone() or (0, None)
+    finally:
+        conn.commit()  # Ends the read transaction
+
+    return {
+        'summary': summary,
+        'recent': recent,
+        'last_id': last_id,
+        'last_moved_at': last_moved_at,
+        'updated_at': time.time()
+    }
+
+def apply_movements(state, movements):
+    """
+    Apply new movements to the summary and recent list in state.
+
+    'adjust' movements (written by an integrity repair) only bring the ledger
+    back in line with inventory, which didn't change, so they are listed but
+    leave the summary alone.
+    """
+    for movement in movements:
+        if movement['action'] != 'adjust':
+            if movement['from_stage'] in state['summary']:
+                state['summary'][movement['from_stage']] -= movement['quantity']
+            if movement['to_stage'] in state['summary']:
+                state['summary'][movement['to_stage']] += movement['quantity']
+
+        state['recent'].append(movement)
+        state['last_id'] = movement['id']
+        state['last_moved_at'] = movement['moved_at']
+
+    if movements:
+        state['updated_at'] = time.time()
+
+def refresh_state(state, conn):
+    """
+    Bring state up to date after data_version reports a change.
+
+    Fetches only the movements after state['last_id'], on conn. Ledger rows
+    are never changed, so that is only valid while the last movement seen is
+    still there with the same timestamp. If it isn't (a backup was restored,
+    or another database was imported with --replace), everything is
+    reloaded, however the new ledger's length compares. It is also
+    reloaded after an integrity repair's 'adjust' movements, since those
+    mean inventory was changed outside the ledger.
+
+    Returns:
+        dict: The updated (or reloaded) state
+    """
+    conn.execute("BEGIN")
+    try:
+        same_ledger = True
+        if state['last_id']:
+            row = conn.execute(
+                "SELECT moved_at FROM stock_movements WHERE id = ?", (state['last_id'],)
+            ).fetchone()
+            same_ledger = row is not None and row[0] == state['last_moved_at']
+        if same_ledger:
+            movements = database.get_movements_since(state['last_id'], conn=conn)
+    finally:
+        conn.commit()  # Ends the read transaction
+
+    if not same_ledger or any(m['action'] == 'adjust' for m in movements):
+        return load_state(conn)
+
+    apply_movements(state, movements)
+    return state
+
+def render(state):
+    """Return the dashboard as a list of screen lines."""
+    summary_rows = [[stage, quantity] for stage, quantity in state['summary'].items()]
+    movement_rows = [
+        [
+            datetime.fromtimestamp(m['moved_at']).strftime('%Y-%m-%d %H:%M:%S'),
+            m['action'],
+            f"{m['quality']} {m['color']} {m['size']}" if m['quality'] is not None
+            else f"variant {m['variant_id']}",
+            f"{m['from_stage'] or '-'} --> {m['to_stage'] or '-'}",
+            m['quantity']
+        ]
+        for m in reversed(state['recent'])  # Newest at the top
+    ]
+
+    updated = datetime.fromtimestamp(state['updated_at']).strftime('%Y-%m-%d %H:%M:%S')
+
+    text = "\n".join([
+        "=== Live Dashboard ===  (Ctrl+C to exit)",
+        f"Database: {config.DB_PATH}",
+        f"Last change: {updated}",
+        "",
+        tabulate(summary_rows, headers=["Stage", "Total Quantity"], tablefmt="fancy_outline"),
+        f"Grand Total: {sum(state['summary'].values())} units across all stages",
+        "",
+        "Recent movements:",
+        tabulate(movement_rows, headers=["Time", "Action", "Sock", "Stages", "Quantity"],
+                 tablefmt="fancy_outline") if movement_rows else "(none yet)"
+    ])
+
+    return text.split("\n")
+
+def redraw(previous, lines):
+    """
+    Rewrite only the screen lines that differ from the previous frame.
+
+    Args:
+        previous (list): Lines currently on screen (empty for the first frame)
+        lines (list): Lines to show
+
+    Returns:
+        list: lines, to pass back in as previous next time
+    """
+    out = []
+
+    if not previous:
+        out.append("\x1b[2J")  # Clear screen on the first frame
+
+    for row, line in enumerate(lines):
+        if row >= len(previous) or previous[row] != line:
+            # Move to the start of the row, write it, clear the rest of the row
+            out.append(f"\x1b[{row + 1};1H{line}\x1b[K")
+
+    if len(lines) < len(previous):
+        # Clear anything left over below the new last line
+        out.append(f"\x1b[{len(lines) + 1};1H\x1b[J")
+
+    # Park the cursor below the dashboard
+    out.append(f"\x1b[{len(lines) + 1};1H")
+
+    sys.stdout.write("".join(out))
+    sys.stdout.flush()
+    return lines
+
+def run_dashboard():
+    """Show the live dashboard until Ctrl+C is pressed."""
+    if os.name == 'nt':
+        os.system('')  # Enables ANSI escape codes in the Windows console
+
+    conn = sqlite3.connect(config.DB_PATH)
+
+    try:
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        state = load_state(conn)
+        screen = redraw([], render(state))
+
+        while True:
+            time.sleep(config.DASHBOARD_POLL_INTERVAL)
+
+            current = conn.execute("PRAGMA data_version").fetchone()[0]
+            if current == version:
+                continue
+
+            version = current
+            state = refresh_state(state, conn)
+            screen = redraw(screen, render(state))
+
+    except KeyboardInterrupt:
+        print("\nLeaving dashboard.")
+
+    finally:
+        conn.close()
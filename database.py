@@ -5,19 +5,67 @@ This module handles all SQLite database interactions including:
 - Database initialization and schema creation
 - Stock addition and movement between stages
 - Inventory queries and reporting
+- Combined reporting across several site databases (config.SITES)
 """
 
 import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 import config
 
+# Active read snapshot (see enable_snapshot). None means reads go straight
+# to config.DB_PATH.
+_snapshot = None
+
+# Connection shared by every call while a session is open (see open_session).
+# None means each call opens its own connection.
+_session = None
+
+
+def _read_connection():
+    """
+    Return a connection for read-only queries.
+
+    Returns:
+        tuple: (connection, owned) - owned is True when the caller must close
+            the connection, False when it is the shared snapshot connection
+    """
+    if _snapshot is not None:
+        if _snapshot['auto_refresh']:
+            refresh_snapshot()
+        return _snapshot['memory'], False
+
+    return _connection()
+
+def _connection():
+    """
+    Return a connection to config.DB_PATH.
+
+    Returns:
+        tuple: (connection, owned) - owned is True when the caller must close
+            the connection, False when it is the open session's connection
+    """
+    if _session is not None:
+        return _session, False
+
+    return sqlite3.connect(config.DB_PATH), True
+
 
 def init_database():
     """
     Initialize the database and create tables if they don't exist.
 
-    Creates two tables:
+    Creates three tables:
     - sock_variants: Stores unique combinations of quality, color, and size
     - inventory: Tracks quantity for each variant at each production stage
+    - stock_movements: Timestamped ledger of every add, move and undo
+      (plus 'adjust' corrections written by integrity.check_integrity)
+
+    When stock_movements is added to a database that already has inventory,
+    each existing inventory row is recorded as an 'opening' movement so the
+    ledger agrees with the current quantities.
     """
     conn = sqlite3.connect(config.DB_PATH)
     cursor = conn.cursor()
@@ -48,9 +96,56 @@ def init_database():
         )
     """)
 
+    # Create stock_movements table (ledger)
+    # from_stage is NULL for stock entering the system (add/opening),
+    # to_stage is NULL for stock leaving it (undo)
+    cursor.execute("""
+        SELECT COUNT(*) FROM sqlite_master
+        WHERE type = 'table' AND name = 'stock_movements'
+    """)
+    ledger_exists = cursor.fetchone()[0] > 0
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stock_movements (
+            id INTEGER PRIMARY KEY,
+            variant_id INTEGER NOT NULL,
+            from_stage TEXT,
+            to_stage TEXT,
+            quantity INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            moved_at REAL NOT NULL,
+            CHECK(action IN ('opening', 'add', 'move', 'undo', 'adjust')),
+            CHECK(quantity > 0)
+        )
+    """)
+
+    if not ledger_exists:
+        cursor.execute("""
+            INSERT INTO stock_movements
+                (variant_id, from_stage, to_stage, quantity, action, moved_at)
+            SELECT variant_id, NULL, stage, quantity, 'opening', ?
+            FROM inventory
+            WHERE quantity > 0
+            ORDER BY id
+        """, (time.time(),))
+
+    # Lets per-variant ledger lookups (integrity checks) avoid a full scan
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_stock_movements_variant
+        ON stock_movements(variant_id)
+    """)
+
     conn.commit()
     conn.close()
 
+def _record_movement(cursor, variant_id, from_stage, to_stage, quantity, action):
+    """Append a row to the stock_movements ledger (inside the caller's transaction)."""
+    cursor.execute("""
+        INSERT INTO stock_movements
+            (variant_id, from_stage, to_stage, quantity, action, moved_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (variant_id, from_stage, to_stage, quantity, action, time.time()))
+
 
 def find_variant_id(quality=None, color=None, size=None):
     """
@@ -84,7 +179,7 @@ def find_variant_id(quality=None, color=None, size=None):
     if quality is None and color is None and size is None:
         raise ValueError("At least one search parameter (quality, color, or size) must be provided")
 
-    conn = sqlite3.connect(config.DB_PATH)
+    conn, owned = _read_connection()
     cursor = conn.cursor()
 
     # Build WHERE clause dynamically based on provided parameters
@@ -109,7 +204,8 @@ def find_variant_id(quality=None, color=None, size=None):
 
     cursor.execute(query, params)
     results = cursor.fetchall()
-    conn.close()
+    if owned:
+        conn.close()
 
     # Extract variant_ids from tuples and return as list
     return [row[0] for row in results]
@@ -127,18 +223,28 @@ def add_stock(quality, color, size, quantity):
         size (str): Size of the sock (e.g., 'S', 'M', 'L')
         quantity (int): Quantity to add (must be positive)
 
+    Returns:
+        dict: Success message with the variant and new Order total
+            {
+                'success': True,
+                'variant_id': int,
+                'quantity_added': int,
+                'order_total': int
+            }
+
     Raises:
         ValueError: If quantity is not positive
 
     Example:
         >>> add_stock('Premium', 'Red', 'M', 100)
         >>> add_stock('Premium', 'Red', 'M', 50)  # Now 150 total in Order stage
+        {'success': True, 'variant_id': 1, 'quantity_added': 50, 'order_total': 150}
     """
     # Validate input
     if quantity <= 0:
         raise ValueError(f"Quantity must be positive, got {quantity}")
 
-    conn = sqlite3.connect(config.DB_PATH)
+    conn, owned = _connection()
     cursor = conn.cursor()
 
     try:
@@ -171,17 +277,33 @@ def add_stock(quality, color, size, quantity):
                 quantity = inventory.quantity + excluded.quantity
         """, (variant_id, 'Order', quantity))
 
+        _record_movement(cursor, variant_id, None, 'Order', quantity, 'add')
+
+        cursor.execute("""
+            SELECT quantity FROM inventory
+            WHERE variant_id = ? AND stage = ?
+        """, (variant_id, 'Order'))
+        order_total = cursor.fetchone()[0]
+
         # Commit transaction
         conn.commit()
 
+        return {
+            'success': True,
+            'variant_id': variant_id,
+            'quantity_added': quantity,
+            'order_total': order_total
+        }
+
     except Exception as e:
         # Rollback on any error
         conn.rollback()
         raise Exception(f"Failed to add stock: {e}")
 
     finally:
-        # Always close connection
-        conn.close()
+        # Close the connection unless it belongs to an open session
+        if owned:
+            conn.close()
 
 def move_stock(variant_id, source_stage, quantity):
     """
@@ -226,10 +348,14 @@ def move_stock(variant_id, source_stage, quantity):
     if not next_stage:
         raise ValueError(f"Cannot move from '{source_stage}' - already at final stage")
 
-    conn = sqlite3.connect(config.DB_PATH)
+    conn, owned = _connection()
     cursor = conn.cursor()
 
     try:
+        # Take the write lock before reading, so the stock check and the
+        # update can't be interleaved with another terminal's changes
+        cursor.execute("BEGIN IMMEDIATE")
+
         # Check if inventory exists for this variant in the source stage
         cursor.execute("""
             SELECT quantity FROM inventory
@@ -267,6 +393,8 @@ def move_stock(variant_id, source_stage, quantity):
                 quantity = inventory.quantity + excluded.quantity
         """, (variant_id, next_stage, quantity))
 
+        _record_movement(cursor, variant_id, source_stage, next_stage, quantity, 'move')
+
         # Get final quantities for confirmation
         cursor.execute("""
             SELECT quantity FROM inventory
@@ -299,8 +427,9 @@ def move_stock(variant_id, source_stage, quantity):
         raise Exception(f"Failed to move stock: {e}")
 
     finally:
-        # Always close connection
-        conn.close()
+        # Close the connection unless it belongs to an open session
+        if owned:
+            conn.close()
 
 def remove_stock():
     """
@@ -339,10 +468,14 @@ def remove_stock():
             'variant_deleted': False
         }
     """
-    conn = sqlite3.connect(config.DB_PATH)
+    conn, owned = _connection()
     cursor = conn.cursor()
 
     try:
+        # Take the write lock before reading, so the record can't change
+        # between reading its quantity and deleting it
+        cursor.execute("BEGIN IMMEDIATE")
+
         # Find the most recent inventory record (highest id)
         cursor.execute("""
             SELECT
@@ -371,6 +504,9 @@ def remove_stock():
             DELETE FROM inventory WHERE id = ?
         """, (record_id,))
 
+        if quantity > 0:
+            _record_movement(cursor, variant_id, stage, None, quantity, 'undo')
+
         # Check if this variant has any remaining inventory
         cursor.execute("""
             SELECT COUNT(*) FROM inventory WHERE variant_id = ?
@@ -407,7 +543,8 @@ def remove_stock():
         raise Exception(f"Failed to remove stock: {e}")
 
     finally:
-        conn.close()
+        if owned:
+            conn.close()
 
 def get_all_inventory():
     """
@@ -432,7 +569,7 @@ def get_all_inventory():
             ...
         ]
     """
-    conn = sqlite3.connect(config.DB_PATH)
+    conn, owned = _read_connection()
     cursor = conn.cursor()
 
     try:
@@ -466,14 +603,19 @@ def get_all_inventory():
         return result
 
     finally:
-        conn.close()
+        if owned:
+            conn.close()
 
-def get_stock_summary():
+def get_stock_summary(conn=None):
     """
     Get total quantity of socks at each production stage.
 
     Returns all stages from config.STAGES, even if they have 0 stock.
 
+    Args:
+        conn (sqlite3.Connection, optional): Query this connection (e.g. inside
+            the caller's read transaction) instead of opening one
+
     Returns:
         dict: Mapping of stage name to total quantity
             Example: {'Order': 500, 'Raw Made': 300, ...}
@@ -488,7 +630,9 @@ def get_stock_summary():
             'Dispatch': 25
         }
     """
-    conn = sqlite3.connect(config.DB_PATH)
+    owned = False
+    if conn is None:
+        conn, owned = _read_connection()
     cursor = conn.cursor()
 
     try:
@@ -512,7 +656,8 @@ def get_stock_summary():
         return summary
 
     finally:
-        conn.close()
+        if owned:
+            conn.close()
 
 def filter_inventory(quality=None, color=None, size=None):
     """
@@ -545,7 +690,7 @@ def filter_inventory(quality=None, color=None, size=None):
     if not variants:
         return []
 
-    conn = sqlite3.connect(config.DB_PATH)
+    conn, owned = _read_connection()
     cursor = conn.cursor()
 
     try:
@@ -586,4 +731,408 @@ def filter_inventory(quality=None, color=None, size=None):
         return result
 
     finally:
-        conn.close()
\ No newline at end of file
+        if owned:
+            conn.close()
+
+def get_movements_since(after_id=0, limit=None, conn=None):
+    """
+    Get stock movements recorded after a given movement id, oldest first.
+
+    Args:
+        after_id (int): Only return movements with id > after_id
+            (0 returns the whole ledger)
+        limit (int, optional): Only return the most recent `limit` movements
+        conn (sqlite3.Connection, optional): Query this connection (e.g. inside
+            the caller's read transaction) instead of opening one
+
+    Returns:
+        list[dict]: Movement records, each containing:
+            - id: Movement id (increases with every add, move and undo)
+            - moved_at: Unix timestamp of the movement
+            - action: 'opening', 'add', 'move', 'undo' or 'adjust'
+            - variant_id, quality, color, size: The sock variant
+              (quality/color/size are None if the variant was since removed)
+            - from_stage: Stage the stock left (None for add/opening)
+            - to_stage: Stage the stock entered (None for undo)
+            - quantity: Units moved
+
+    Example:
+        >>> get_movements_since(41)
+        [{'id': 42, 'moved_at': 1735689600.0, 'action': 'move', 'variant_id': 1,
+          'quality': 'A', 'color': 'Red', 'size': 'L', 'from_stage': 'Order',
+          'to_stage': 'Raw Made', 'quantity': 50}]
+    """
+    owned = False
+    if conn is None:
+        conn, owned = _read_connection()
+    cursor = conn.cursor()
+
+    try:
+        query = """
+            SELECT
+                stock_movements.id,
+                moved_at,
+                action,
+                stock_movements.variant_id,
+                quality,
+                color,
+                size,
+                from_stage,
+                to_stage,
+                quantity
+            FROM stock_movements
+            LEFT JOIN sock_variants ON stock_movements.variant_id = sock_variants.variant_id
+            WHERE stock_movements.id > ?
+            ORDER BY stock_movements.id DESC
+        """
+        params = [after_id]
+
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+
+        # Newest first from the query (so LIMIT keeps the latest); return oldest first
+        result = []
+        for row in reversed(rows):
+            result.append({
+                'id': row[0],
+                'moved_at': row[1],
+                'action': row[2],
+                'variant_id': row[3],
+                'quality': row[4],
+                'color': row[5],
+                'size': row[6],
+                'from_stage': row[7],
+                'to_stage': row[8],
+                'quantity': row[9]
+            })
+
+        return result
+
+    finally:
+        if owned:
+            conn.close()
+
+def _copy_to_snapshot(source, memory):
+    """
+    Copy source into memory with the online backup API, in a single step.
+
+    A stepped copy restarts from the beginning whenever another connection
+    commits between steps, so under steady writes it may never finish. One
+    step holds the source's shared lock only as long as a memory copy takes
+    (well under a second for a 100 MB database); writers wait that long.
+    """
+    source.backup(memory)
+
+def _data_version(conn):
+    """Return PRAGMA data_version for conn (changes when another connection commits)."""
+    return conn.execute("PRAGMA data_version").fetchone()[0]
+
+def enable_snapshot(auto_refresh=True):
+    """
+    Switch read functions to an in-memory snapshot of the database.
+
+    The database file is copied into an in-memory SQLite database with the
+    online backup API in one step, so writers are only held up for the
+    length of a memory copy and the copy can't be restarted by their commits.
+    get_all_inventory(), get_stock_summary(), filter_inventory() and
+    find_variant_id() then read from the snapshot. Writes are unaffected and
+    always go to config.DB_PATH.
+
+    Args:
+        auto_refresh (bool): If True, every read first checks PRAGMA
+            data_version on the database file and re-copies the snapshot when
+            another connection has committed. If False, the snapshot only
+            changes when refresh_snapshot() is called.
+
+    Example:
+        >>> enable_snapshot(auto_refresh=False)
+        >>> get_stock_summary()  # Reads the in-memory copy
+        >>> refresh_snapshot()   # Pick up new writes
+    """
+    global _snapshot
+
+    disable_snapshot()
+
+    source = sqlite3.connect(config.DB_PATH)
+    memory = sqlite3.connect(":memory:")
+
+    try:
+        # Read the version before copying: a commit that lands during or
+        # after the copy then shows up as a change on the next check
+        version = _data_version(source)
+        _copy_to_snapshot(source, memory)
+    except Exception:
+        source.close()
+        memory.close()
+        raise
+
+    _snapshot = {
+        'source': source,
+        'memory': memory,
+        'data_version': version,
+        'auto_refresh': auto_refresh
+    }
+
+def refresh_snapshot(force=False):
+    """
+    Re-copy the snapshot if the database file has changed since the last copy.
+
+    Args:
+        force (bool): Re-copy even if data_version has not changed
+
+    Returns:
+        bool: True if the snapshot was refreshed, False if it was already current
+
+    Raises:
+        ValueError: If no snapshot is enabled
+    """
+    if _snapshot is None:
+        raise ValueError("No snapshot enabled - call enable_snapshot() first")
+
+    version = _data_version(_snapshot['source'])
+    if not force and version == _snapshot['data_version']:
+        return False
+
+    # Store the version read before the copy, not after: a commit landing
+    # between the copy and a second PRAGMA would otherwise count as seen
+    _copy_to_snapshot(_snapshot['source'], _snapshot['memory'])
+    _snapshot['data_version'] = version
+    return True
+
+def disable_snapshot():
+    """Close the snapshot (if any) and send reads back to the database file."""
+    global _snapshot
+
+    if _snapshot is None:
+        return
+
+    _snapshot['source'].close()
+    _snapshot['memory'].close()
+    _snapshot = None
+
+def open_session():
+    """
+    Share one connection between all calls until close_session().
+
+    Every add, move, undo and (unless a read snapshot is enabled) every read
+    uses this connection instead of opening its own, which saves the
+    connection setup on each call when many operations run back to back.
+    Each operation is still committed on its own.
+
+    Example:
+        >>> open_session()
+        >>> for line in lines:
+        ...     add_stock(*line)
+        >>> close_session()
+    """
+    global _session
+
+    if _session is None:
+        _session = sqlite3.connect(config.DB_PATH)
+
+def close_session():
+    """Close the connection opened by open_session(), if any."""
+    global _session
+
+    if _session is not None:
+        _session.close()
+        _session = None
+
+def get_site_paths(sites=None):
+    """
+    Return the site databases to report on.
+
+    Args:
+        sites (list, optional): Site names from config.SITES to include.
+            Defaults to every configured site.
+
+    Returns:
+        dict: Mapping of site name to database path. If config.SITES is
+            empty, this is {'Local': config.DB_PATH}.
+
+    Raises:
+        ValueError: If sites is empty or a requested site is not in config.SITES
+    """
+    configured = config.SITES or {'Local': config.DB_PATH}
+
+    if sites is None:
+        return dict(configured)
+
+    if not sites:
+        raise ValueError("No sites given - pass at least one site name, or None for all sites")
+
+    unknown = [site for site in sites if site not in configured]
+    if unknown:
+        raise ValueError(f"Unknown site(s): {', '.join(unknown)}")
+
+    return {site: configured[site] for site in sites}
+
+def _query_site(path, query, params):
+    """Run a read query against one site database and return all rows."""
+    # Read-only, so a mistyped path raises instead of creating an empty database
+    conn = sqlite3.connect(Path(path).absolute().as_uri() + '?mode=ro', uri=True)
+    try:
+        return conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+
+def _fan_out(query, params=(), sites=None):
+    """
+    Run the same read query against every site database in parallel.
+
+    Each site gets its own thread and connection. sqlite3 releases the GIL
+    while a query runs, so the sites are scanned concurrently and latency
+    stays close to that of the slowest single site as sites are added.
+    (An ATTACH-based UNION would run on one thread and is capped at 10
+    attached databases by default.)
+
+    Returns:
+        list[tuple]: (site, rows) pairs in site order
+    """
+    paths = get_site_paths(sites)
+
+    with ThreadPoolExecutor(max_workers=len(paths)) as pool:
+        futures = [
+            (site, pool.submit(_query_site, path, query, params))
+            for site, path in paths.items()
+        ]
+        return [(site, future.result()) for site, future in futures]
+
+def _site_inventory(where_clause, params, sites):
+    """Fetch inventory rows from every site, labelled with the site name."""
+    query = f"""
+        SELECT
+            inventory.variant_id,
+            quality,
+            color,
+            size,
+            stage,
+            quantity
+        FROM inventory
+        JOIN sock_variants ON inventory.variant_id = sock_variants.variant_id
+        {where_clause}
+        ORDER BY inventory.variant_id, stage
+    """
+
+    result = []
+    for site, rows in _fan_out(query, params, sites):
+        for row in rows:
+            result.append({
+                'site': site,
+                'variant_id': row[0],
+                'quality': row[1],
+                'color': row[2],
+                'size': row[3],
+                'stage': row[4],
+                'quantity': row[5]
+            })
+
+    return result
+
+def get_site_inventory(sites=None):
+    """
+    Get all inventory records from every site, labelled by site.
+
+    Args:
+        sites (list, optional): Site names to include (default: all)
+
+    Returns:
+        list[dict]: Same format as get_all_inventory(), plus a 'site' key.
+            Note that variant_id values are local to each site.
+
+    Example:
+        >>> get_site_inventory()
+        [
+            {'site': 'Unit 1', 'variant_id': 1, 'quality': 'A', 'color': 'Red',
+             'size': 'L', 'stage': 'Order', 'quantity': 100},
+            ...
+        ]
+    """
+    return _site_inventory("", (), sites)
+
+def filter_site_inventory(quality=None, color=None, size=None, sites=None):
+    """
+    Get inventory records from every site filtered by quality, color, and/or size.
+
+    At least one filter parameter must be provided.
+
+    Args:
+        quality (str, optional): Quality grade filter
+        color (str, optional): Color filter
+        size (str, optional): Size filter
+        sites (list, optional): Site names to include (default: all)
+
+    Returns:
+        list[dict]: Same format as get_site_inventory()
+
+    Raises:
+        ValueError: If no filter parameters are provided
+
+    Example:
+        >>> filter_site_inventory(color='Red')
+        [{'site': 'Unit 1', 'variant_id': 1, 'quality': 'A', 'color': 'Red', ...}, ...]
+    """
+    if quality is None and color is None and size is None:
+        raise ValueError("At least one filter parameter (quality, color, or size) must be provided")
+
+    conditions = []
+    params = []
+
+    if quality is not None:
+        conditions.append("quality = ?")
+        params.append(quality)
+
+    if color is not None:
+        conditions.append("color = ?")
+        params.append(color)
+
+    if size is not None:
+        conditions.append("size = ?")
+        params.append(size)
+
+    where_clause = "WHERE " + " AND ".join(conditions)
+    return _site_inventory(where_clause, params, sites)
+
+def get_site_stock_summary(sites=None):
+    """
+    Get total quantity at each production stage for every site, plus a combined total.
+
+    Args:
+        sites (list, optional): Site names to include (default: all)
+
+    Returns:
+        dict: {'by_site': {site: summary}, 'total': summary}, where each
+            summary has the same format as get_stock_summary()
+
+    Example:
+        >>> get_site_stock_summary()
+        {
+            'by_site': {
+                'Unit 1': {'Order': 500, 'Raw Made': 300, ...},
+                'Unit 2': {'Order': 120, 'Raw Made': 80, ...}
+            },
+            'total': {'Order': 620, 'Raw Made': 380, ...}
+        }
+    """
+    query = """
+        SELECT stage, SUM(quantity) as total
+        FROM inventory
+        GROUP BY stage
+    """
+
+    by_site = {}
+    total = {stage: 0 for stage in config.STAGES}
+
+    for site, rows in _fan_out(query, (), sites):
+        summary = {stage: 0 for stage in config.STAGES}
+        for stage, quantity in rows:
+            if stage in summary:  # Verify it's a valid stage
+                summary[stage] = quantity
+                total[stage] += quantity
+        by_site[site] = summary
+
+    return {'by_site': by_site, 'total': total}
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Integrity checker and repair tool for the Sock Factory inventory database.
+
+Every check is a single set-based SQL query whose results are streamed, so
+the cost grows with the size of the tables and not with Python loops:
+- orphaned_variants: sock_variants with no inventory rows
+- missing_variants: inventory rows pointing at a variant that doesn't exist
+- invalid_stages: inventory or stock_movements stages not in config.STAGES
+- negative_quantities: inventory rows below zero
+- ledger_mismatches: inventory quantities that differ from the net of the
+  stock_movements ledger for that variant and stage
+
+Incremental mode only re-checks variants changed since the last clean run:
+those with new ledger movements, plus any whose sock_variants, inventory or
+stock_movements rows were changed some other way (e.g. by hand in SQL). The
+latter are recorded in integrity_changes by triggers that the first run
+installs, so changes made before any run are only found by a full check.
+
+Repair mode fixes what can be fixed without guessing: placeholder variants
+for missing ones, orphans deleted, and an 'adjust' ledger movement so the
+ledger agrees with inventory. Invalid stages and negative quantities are
+only reported.
+
+Run with: python3 integrity.py [--incremental] [--repair]
+"""
+
+import argparse
+import sqlite3
+import sys
+import time
+
+import config
+
+# Problem rows kept per check in the result (all of them are still counted)
+SAMPLE_SIZE = 20
+
+CHECKS = [
+    'orphaned_variants',
+    'missing_variants',
+    'invalid_stages',
+    'negative_quantities',
+    'ledger_mismatches'
+]
+
+# Tables whose changes incremental mode has to notice, and the events tracked
+# on each (new ledger rows are already found by id, so only edits are tracked)
+TRACKED = {
+    'sock_variants': ['INSERT', 'UPDATE', 'DELETE'],
+    'inventory': ['INSERT', 'UPDATE', 'DELETE'],
+    'stock_movements': ['UPDATE', 'DELETE']
+}
+
+
+def _create_state_tables(cursor):
+    """
+    Create the tables used by incremental mode, and the triggers that fill
+    integrity_changes.
+
+    integrity_checks records each run. integrity_changes gets a row for each
+    variant touched by a tracked change. Its ids come from AUTOINCREMENT, so
+    they keep rising after old rows are pruned.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS integrity_checks (
+            id INTEGER PRIMARY KEY,
+            checked_at REAL NOT NULL,
+            mode TEXT NOT NULL,
+            last_movement_id INTEGER NOT NULL,
+            last_change_id INTEGER,
+            problems INTEGER NOT NULL
+        )
+    """)
+
+    # Tables from before change tracking: add the column. Their runs have no
+    # change id, so the next incremental run falls back to a full check
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(integrity_checks)")]
+    if 'last_change_id' not in columns:
+        cursor.execute("ALTER TABLE integrity_checks ADD COLUMN last_change_id INTEGER")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS integrity_changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            variant_id INTEGER NOT NULL
+        )
+    """)
+
+    for table, events in TRACKED.items():
+        for event in events:
+            if event == 'INSERT':
+                touched = "SELECT NEW.variant_id"
+            elif event == 'DELETE':
+                touched = "SELECT OLD.variant_id"
+            else:
+                touched = "SELECT OLD.variant_id UNION SELECT NEW.variant_id"
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS integrity_track_{table}_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    INSERT INTO integrity_changes (variant_id) {touched};
+                END
+            """)
+
+def _queries(touched_only):
+    """
+    Return the SQL for each check.
+
+    Args:
+        touched_only (bool): Limit the checks to variants listed in
+            temp.touched_variants (incremental mode)
+    """
+    stages = ", ".join(f"'{stage}'" for stage in config.STAGES)
+
+    def scope(column):
+        if touched_only:
+            return f"{column} IN (SELECT variant_id FROM temp.touched_variants)"
+        return "1"
+
+    return {
+        'orphaned_variants': f"""
+            SELECT variant_id, quality, color, size
+            FROM sock_variants AS v
+            WHERE {scope('v.variant_id')}
+              AND NOT EXISTS (SELECT 1 FROM inventory WHERE inventory.variant_id = v.variant_id)
+        """,
+        'missing_variants': f"""
+            SELECT id, variant_id, stage, quantity
+            FROM inventory AS i
+            WHERE {scope('i.variant_id')}
+              AND NOT EXISTS (SELECT 1 FROM sock_variants WHERE sock_variants.variant_id = i.variant_id)
+        """,
+        'invalid_stages': f"""
+            SELECT 'inventory', id, variant_id, stage
+            FROM inventory
+            WHERE {scope('variant_id')} AND stage NOT IN ({stages})
+            UNION ALL
+            SELECT 'stock_movements', id, variant_id, COALESCE(from_stage, to_stage)
+            FROM stock_movements
+            WHERE {scope('variant_id')}
+              AND (from_stage NOT IN ({stages}) OR to_stage NOT IN ({stages}))
+        """,
+        'negative_quantities': f"""
+            SELECT id, variant_id, stage, quantity
+            FROM inventory
+            WHERE {scope('variant_id')} AND quantity < 0
+        """,
+        # Net of ledger minus inventory in one grouped pass; non-zero means a mismatch
+        'ledger_mismatches': f"""
+            SELECT variant_id, stage, SUM(ledger) AS ledger, SUM(ledger) - SUM(actual) AS difference
+            FROM (
+                SELECT variant_id, to_stage AS stage, quantity AS ledger, 0 AS actual
+                FROM stock_movements WHERE {scope('variant_id')} AND to_stage IS NOT NULL
+                UNION ALL
+                SELECT variant_id, from_stage, -quantity, 0
+                FROM stock_movements WHERE {scope('variant_id')} AND from_stage IS NOT NULL
+                UNION ALL
+                SELECT variant_id, stage, 0, quantity
+                FROM inventory WHERE {scope('variant_id')}
+            )
+            GROUP BY variant_id, stage
+            HAVING SUM(ledger) != SUM(actual)
+        """
+    }
+
+def _run_check(cursor, query):
+    """Stream a check query, returning (count, first SAMPLE_SIZE rows)."""
+    count = 0
+    sample = []
+    for row in cursor.execute(query):
+        count += 1
+        if len(sample) < SAMPLE_SIZE:
+            sample.append(row)
+    return count, sample
+
+def _repair(cursor, touched_only):
+    """
+    Fix the problems that have a safe fix, inside the caller's transaction.
+
+    Returns:
+        dict: Number of rows repaired per check
+    """
+    queries = _queries(touched_only)
+    repaired = {}
+
+    # Missing variants: recreate as placeholders so their stock stays visible
+    cursor.execute(f"""
+        INSERT INTO sock_variants (variant_id, quality, color, size)
+        SELECT DISTINCT variant_id, 'UNKNOWN', 'UNKNOWN', 'variant-' || variant_id
+        FROM ({queries['missing_variants']})
+    """)
+    repaired['missing_variants'] = cursor.rowcount
+
+    # Orphaned variants: nothing refers to them, remove
+    cursor.execute(f"""
+        DELETE FROM sock_variants
+        WHERE variant_id IN (SELECT variant_id FROM ({queries['orphaned_variants']}))
+    """)
+    repaired['orphaned_variants'] = cursor.rowcount
+
+    # Ledger mismatches: inventory is what's on the shelf, so correct the ledger to it
+    now = time.time()
+    cursor.execute(f"""
+        INSERT INTO stock_movements
+            (variant_id, from_stage, to_stage, quantity, action, moved_at)
+        SELECT
+            variant_id,
+            CASE WHEN difference > 0 THEN stage END,
+            CASE WHEN difference < 0 THEN stage END,
+            ABS(difference),
+            'adjust',
+            ?
+        FROM ({queries['ledger_mismatches']})
+    """, (now,))
+    repaired['ledger_mismatches'] = cursor.rowcount
+
+    return repaired
+
+def check_integrity(incremental=False, repair=False):
+    """
+    Check the database for inconsistencies and optionally repair them.
+
+    All checks run inside one transaction, so they see a single consistent
+    state of the database even while other terminals are writing.
+
+    Args:
+        incremental (bool): Only check variants changed since the last run
+            that found no problems (see module docstring). Falls back to a
+            full check if there has been no clean run since change tracking
+            was installed
+        repair (bool): Apply the safe repairs (see module docstring) in the
+            same transaction
+
+    Returns:
+        dict: Results of the run
+            {
+                'mode': 'full' or 'incremental',
+                'variants_checked': int or None,  # None means all variants
+                'counts': {check: int},           # Problems found per check
+                'samples': {check: list},         # Up to SAMPLE_SIZE rows per check
+                'repaired': {check: int},         # Empty unless repair=True
+                'remaining': int,                 # Problems left after any repair
+                'ok': bool,                       # True if nothing was found
+                'seconds': float
+            }
+
+    Example:
+        >>> check_integrity()
+        {'mode': 'full', 'variants_checked': None, 'counts': {'orphaned_variants': 0, ...},
+         'ok': True, ...}
+    """
+    start = time.perf_counter()
+    conn = sqlite3.connect(config.DB_PATH)
+    cursor = conn.cursor()
+
+    try:
+        _create_state_tables(cursor)
+        conn.commit()
+
+        # One transaction for every check (and repair) so they agree with each other
+        cursor.execute("BEGIN IMMEDIATE" if repair else "BEGIN")
+
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM stock_movements")
+        last_movement_id = cursor.fetchone()[0]
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM integrity_changes")
+        last_change_id = cursor.fetchone()[0]
+
+        since = None
+        if incremental:
+            cursor.execute("""
+                SELECT last_movement_id, last_change_id FROM integrity_checks
+                WHERE problems = 0 ORDER BY id DESC LIMIT 1
+            """)
+            since = cursor.fetchone()
+
+        variants_checked = None
+        if since is None or since[1] is None:
+            mode = 'full'
+        else:
+            mode = 'incremental'
+            cursor.execute("DROP TABLE IF EXISTS temp.touched_variants")
+            cursor.execute("""
+                CREATE TEMP TABLE touched_variants AS
+                SELECT variant_id FROM stock_movements WHERE id > ?
+                UNION
+                SELECT variant_id FROM integrity_changes WHERE id > ?
+            """, since)
+            cursor.execute("SELECT COUNT(*) FROM temp.touched_variants")
+            variants_checked = cursor.fetchone()[0]
+
+        counts = {}
+        samples = {}
+        for name, query in _queries(mode == 'incremental').items():
+            counts[name], samples[name] = _run_check(cursor, query)
+
+        repaired = {}
+        remaining = sum(counts.values())
+
+        if repair:
+            repaired = _repair(cursor, mode == 'incremental')
+            # Repair counts are in their own units (e.g. variants recreated,
+            # not inventory rows fixed), so check again to see what is left
+            remaining = sum(
+                _run_check(cursor, query)[0]
+                for query in _queries(mode == 'incremental').values()
+            )
+        else:
+            # Release the read snapshot before writing, so a waiting writer
+            # can't deadlock with this run's lock upgrade
+            conn.commit()
+
+        # Problems still left after repair decide whether this run counts as clean
+        cursor.execute("""
+            INSERT INTO integrity_checks
+                (checked_at, mode, last_movement_id, last_change_id, problems)
+            VALUES (?, ?, ?, ?, ?)
+        """, (time.time(), mode, last_movement_id, last_change_id, remaining))
+
+        # Incremental runs only read changes after the last clean run, so
+        # older ones can go (all of them up to this run if none was clean)
+        cursor.execute("""
+            DELETE FROM integrity_changes
+            WHERE id <= COALESCE(
+                (SELECT MAX(last_change_id) FROM integrity_checks WHERE problems = 0), ?
+            )
+        """, (last_change_id,))
+
+        conn.commit()
+
+        return {
+            'mode': mode,
+            'variants_checked': variants_checked,
+            'counts': counts,
+            'samples': samples,
+            'repaired': repaired,
+            'remaining': remaining,
+            'ok': sum(counts.values()) == 0,
+            'seconds': time.perf_counter() - start
+        }
+
+    except Exception as e:
+        conn.rollback()
+        raise Exception(f"Failed to check integrity: {e}")
+
+    finally:
+        conn.close()
+
+def print_report(result):
+    """Print a check_integrity() result in a readable form."""
+    scope = ("all variants" if result['variants_checked'] is None
+             else f"{result['variants_checked']} changed variant(s)")
+    print(f"\n=== Integrity Check ({result['mode']}, {scope}) ===")
+    if result['mode'] == 'incremental':
+        print("  Covers variants with stock, ledger or variant changes since the last clean run")
+
+    for name in CHECKS:
+        count = result['counts'][name]
+        mark = "✓" if count == 0 else "✗"
+        line = f"  {mark} {name.replace('_', ' ')}: {count}"
+        if name in result['repaired']:
+            line += f" (repaired {result['repaired'][name]})"
+        print(line)
+        for row in result['samples'][name]:
+            print(f"      {row}")
+        if count > len(result['samples'][name]):
+            print(f"      ... and {count - len(result['samples'][name])} more")
+
+    if result['repaired']:
+        print(f"\nProblems left after repair: {result['remaining']}")
+
+    print(f"\nFinished in {result['seconds']:.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Check inventory.db for inconsistencies")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only re-check variants changed since the last clean run")
+    parser.add_argument('--repair', action='store_true',
+                        help="Fix problems that can be fixed safely")
+    parser.add_argument('--db', help=f"Database to check (default: {config.DB_PATH})")
+    args = parser.parse_args()
+
+    if args.db:
+        config.DB_PATH = args.db
+
+    result = check_integrity(incremental=args.incremental, repair=args.repair)
+    print_report(result)
+
+    sys.exit(0 if result['remaining'] == 0 else 1)
+
+if __name__ == "__main__":
+    main()
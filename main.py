@@ -4,27 +4,59 @@ Sock Factory Inventory Management System - Main Entry Point
 
 A command-line interface for managing sock inventory through production stages.
 Run with: ./main.py or python3 main.py
+
+Without arguments it starts the interactive menus. Operations can also be run
+directly, or many at once from a file:
+    python3 main.py add A red M 100
+    python3 main.py move A red M "Raw Made" 50
+    python3 main.py undo | summary | list
+    python3 main.py filter [--quality Q] [--color C] [--size S]
+    python3 main.py --batch operations.txt [--quiet] [--timings timings.csv]
 """
 
+import argparse
+import contextlib
+import csv
+import os
+import shlex
+import sys
+import time
+from collections import defaultdict
+
 import database
 import config
+import analytics
+import backup
+import dashboard
+import integrity
+import allocation
 from tabulate import tabulate
 
+def ask_choice(count):
+    """
+    Ask for a menu choice until a number from 1 to count is entered.
+
+    Returns:
+        int: The choice
+    """
+    valid = [str(n) for n in range(1, count + 1)]
+
+    while True:
+        choice = input(f"\nEnter your choice (1-{count}): ")
+        if choice in valid:
+            return int(choice)
+        print(f"Invalid choice. Please enter {', '.join(valid[:-1])}, or {valid[-1]}.")
+
 def main_menu():
     """Display main menu and return user's choice."""
     print("\n=== Main Menu ===")
     print("1. Update Mode")
     print("2. View Mode")
-    print("3. Exit")
-
-    choice = input("\nEnter your choice (1-3): ")
-
-    # Validate input
-    if choice not in ['1', '2', '3']:
-        print("Invalid choice. Please enter 1, 2, or 3.")
-        return main_menu()  # Ask again
+    print("3. Dashboard Mode")
+    print("4. Backup Mode")
+    print("5. Exit")
 
-    return int(choice)
+    return ask_choice(5)
 
 def update_mode():
     """Handle update mode operations."""
@@ -32,16 +64,10 @@ def update_mode():
     print("1. Add new stock")
     print("2. Move stock")
     print("3. Undo last operation")
-    print("4. Back")
-
-    choice = input("\nEnter your choice (1-4): ")
+    print("4. Dispatch orders from file")
+    print("5. Back")
 
-    # Validate input
-    if choice not in ['1', '2', '3', '4']:
-        print("Invalid choice. Please enter 1, 2, 3, or 4.")
-        return update_mode()  # Ask again
-
-    choice = int(choice)
+    choice = ask_choice(5)
 
     if choice == 1:
         # Add new stock
@@ -51,10 +77,7 @@ def update_mode():
             size = input('Size: ')
             quantity = int(input('Quantity: '))
 
-            database.add_stock(quality, color, size, quantity)
-
-            # Confirmation message
-            print(f"\n✓ Successfully added {quantity} units of {color} {size} socks (Quality {quality}) to Order stage")
+            run_add(quality, color, size, quantity)
 
         except ValueError as e:
             print(f"\n✗ Error: {e}")
@@ -62,41 +85,25 @@ def update_mode():
             print(f"\n✗ Failed to add stock: {e}")
 
     elif choice == 2:
-        # Move stock - show current inventory first
+        # Move stock
         inventory = database.get_all_inventory()
         if not inventory:
             print("No inventory to move. Add stock first!")
             return
-        
+
         try:
             print("\n--- Select Sock to Move ---")
             quality = input('Quality: ')
             color = input('Color: ')
             size = input('Size: ')
 
-            # Find variant
-            variants = database.find_variant_id(quality, color, size)
-            if not variants:
-                print(f"\n✗ No stock found for {color} {size} socks (Quality {quality})")
-                return
-
-            variant_id = variants[0]
-
             # Get stage to move from
             ch = stage_change()
             source_stage = config.STAGES[ch - 1]  # Convert choice to stage name
 
             quantity = int(input("\nQuantity to move: "))
 
-            # Move the stock
-            result = database.move_stock(variant_id, source_stage, quantity)
-
-            if result['success']:
-                print(f"\n✓ Successfully moved {result['quantity_moved']} units")
-                print(f"  From: {result['source_stage']} (remaining: {result['source_remaining']})")
-                print(f"  To: {result['destination_stage']} (new total: {result['destination_total']})")
-            else:
-                print(f"\n✗ Failed to move stock")
+            run_move(quality, color, size, source_stage, quantity)
 
         except ValueError as e:
             print(f"\n✗ Error: {e}")
@@ -106,18 +113,7 @@ def update_mode():
     elif choice == 3:
         # Remove last entry
         try:
-            result = database.remove_stock()
-
-            if result['success']:
-                info = result['deleted_info']
-                print(f"\n✓ Successfully removed last entry:")
-                print(f"  {info['quantity']} units of {info['color']} {info['size']} socks (Quality {info['quality']})")
-                print(f"  From stage: {info['stage']}")
-
-                if result['variant_deleted']:
-                    print(f"  Note: Variant fully removed (no remaining inventory)")
-            else:
-                print("\n✗ Failed to remove stock")
+            run_undo()
 
         except ValueError as e:
             print(f"\n✗ Error: {e}")
@@ -125,8 +121,72 @@ def update_mode():
             print(f"\n✗ Failed to remove stock: {e}")
 
     elif choice == 4:
+        # Dispatch a batch of orders from Ready Stock
+        try:
+            path = input('\nOrders CSV file (order_id, quality, color, size, quantity): ').strip()
+            lines = allocation.read_order_lines(path)
+
+            priority = input("Priority when stock is short - fifo, largest or fair (blank for fifo): ")
+            priority = priority.strip().lower() or 'fifo'
+
+            plan = allocation.dispatch_orders(lines, priority, dry_run=True)
+            allocation.print_plan(plan)
+
+            if plan['allocated'] == 0:
+                print("\nNothing to dispatch.")
+                return
+
+            confirm = input(f"\nMove {plan['allocated']} units to Dispatch? Type 'yes' to continue: ")
+            if confirm.strip().lower() != 'yes':
+                print("\nDispatch cancelled.")
+                return
+
+            # Planned again inside the dispatch transaction, in case stock changed meanwhile
+            result = allocation.dispatch_orders(lines, priority)
+            print(f"\n✓ Dispatched {result['allocated']} units for {result['filled'] + result['partial']} order line(s)")
+
+        except (OSError, ValueError) as e:
+            print(f"\n✗ Error: {e}")
+        except Exception as e:
+            print(f"\n✗ {e}")
+
+    elif choice == 5:
         return
 
+def run_add(quality, color, size, quantity):
+    """Add stock to the Order stage and print a confirmation."""
+    database.add_stock(quality, color, size, quantity)
+    print(f"\n✓ Successfully added {quantity} units of {color} {size} socks (Quality {quality}) to Order stage")
+
+def run_move(quality, color, size, source_stage, quantity):
+    """
+    Move stock of one sock type to the stage after source_stage and print a confirmation.
+
+    Raises:
+        ValueError: If there is no such sock type
+    """
+    variants = database.find_variant_id(quality, color, size)
+    if not variants:
+        raise ValueError(f"No stock found for {color} {size} socks (Quality {quality})")
+
+    result = database.move_stock(variants[0], source_stage, quantity)
+
+    print(f"\n✓ Successfully moved {result['quantity_moved']} units")
+    print(f"  From: {result['source_stage']} (remaining: {result['source_remaining']})")
+    print(f"  To: {result['destination_stage']} (new total: {result['destination_total']})")
+
+def run_undo():
+    """Undo the last add or move and print what was removed."""
+    result = database.remove_stock()
+
+    info = result['deleted_info']
+    print(f"\n✓ Successfully removed last entry:")
+    print(f"  {info['quantity']} units of {info['color']} {info['size']} socks (Quality {info['quality']})")
+    print(f"  From stage: {info['stage']}")
+
+    if result['variant_deleted']:
+        print(f"  Note: Variant fully removed (no remaining inventory)")
+
 def stage_change():
     print('\nWhich stage are you changing?')
     print('1. Order --> Raw Made')
@@ -134,14 +194,7 @@ def stage_change():
     print('3. Sent for Press --> Ready Stock')
     print('4. Ready Stock --> Dispatch')
 
-    choice = input("\nEnter your choice (1-4): ")
-
-    # Validate input
-    if choice not in ['1', '2', '3', '4']:
-        print("Invalid choice. Please enter 1, 2, 3, or 4.")
-        return stage_change()  # Ask again
-    
-    return int(choice)
+    return ask_choice(4)
 
 def view_mode():
     """Handle view mode operations."""
@@ -149,16 +202,11 @@ def view_mode():
     print("1. Show all stock")
     print("2. Show summary")
     print("3. Filter Stock")
-    print("4. Back")
-
-    choice = input("\nEnter your choice (1-4): ")
+    print("4. All-sites summary")
+    print("5. Flow analytics")
+    print("6. Back")
 
-    # Validate input
-    if choice not in ['1', '2', '3', '4']:
-        print("Invalid choice. Please enter 1, 2, 3, or 4.")
-        return view_mode()  # Ask again
-    
-    choice = int(choice)
+    choice = ask_choice(6)
 
     if choice == 1:
         display(database.get_all_inventory())
@@ -170,9 +218,76 @@ def view_mode():
         display(filter_inventory())
 
     elif choice == 4:
+        try:
+            display_site_summary(database.get_site_stock_summary())
+        except Exception as e:
+            print(f"\n✗ Failed to read site databases: {e}")
+
+    elif choice == 5:
+        display_flow_report(analytics.flow_report())
+
+    elif choice == 6:
         # Back to main menu - just return
         return
 
+def backup_mode():
+    """Handle backup and restore operations."""
+    print("\n--- Backup Mode ---")
+    print("1. Back up now")
+    print("2. Restore from backup")
+    print("3. Check database integrity")
+    print("4. Back")
+
+    choice = ask_choice(4)
+
+    if choice == 1:
+        try:
+            path = input(f"\nBackup file (blank for {backup.default_backup_path()}): ").strip()
+            result = backup.backup_database(path or None)
+
+            print(f"\n✓ Backup written to {result['backup_path']}")
+            print(f"  {result['database_bytes']} bytes -> {result['backup_bytes']} bytes "
+                  f"in {result['seconds']:.2f}s")
+            print(f"  SHA-256: {result['checksum']}")
+
+        except ValueError as e:
+            print(f"\n✗ Error: {e}")
+        except Exception as e:
+            print(f"\n✗ Failed to back up: {e}")
+
+    elif choice == 2:
+        try:
+            path = input("\nBackup file to restore: ").strip()
+            confirm = input("This replaces all current inventory. Type 'yes' to continue: ")
+            if confirm.strip().lower() != 'yes':
+                print("\nRestore cancelled.")
+                return
+
+            result = backup.restore_database(path)
+
+            print(f"\n✓ Restored from {result['backup_path']} in {result['seconds']:.2f}s")
+
+        except ValueError as e:
+            print(f"\n✗ Error: {e}")
+        except Exception as e:
+            print(f"\n✗ Failed to restore: {e}")
+
+    elif choice == 3:
+        try:
+            result = integrity.check_integrity()
+            integrity.print_report(result)
+
+            if not result['ok']:
+                confirm = input("\nRepair what can be repaired safely? Type 'yes' to continue: ")
+                if confirm.strip().lower() == 'yes':
+                    integrity.print_report(integrity.check_integrity(repair=True))
+
+        except Exception as e:
+            print(f"\n✗ {e}")
+
+    elif choice == 4:
+        return
+
 def display(rows):
     """Display inventory data in a formatted table."""
     if not rows:
@@ -194,6 +309,48 @@ def display_summary(summary):
     total = sum(summary.values())
     print(f"\nGrand Total: {total} units across all stages")
 
+def display_site_summary(result):
+    """Display per-stage totals with one column per site and a combined total."""
+    print("\n=== Stock Summary by Stage and Site ===")
+
+    sites = list(result['by_site'])
+    table_data = [
+        [stage] + [result['by_site'][site][stage] for site in sites] + [total]
+        for stage, total in result['total'].items()
+    ]
+
+    print(tabulate(table_data, headers=["Stage"] + sites + ["Total"], tablefmt="fancy_outline"))
+
+    # Show grand total
+    total = sum(result['total'].values())
+    print(f"\nGrand Total: {total} units across {len(sites)} site(s)")
+
+def display_flow_report(report):
+    """Display per-stage throughput, WIP and dwell time, and the bottleneck stage."""
+    print(f"\n=== Flow Analytics (last {report['days']} days) ===")
+
+    if not report['movements']:
+        print("\nNo stock movements recorded yet.")
+        return
+
+    def days(value):
+        return "-" if value != value else f"{value:.1f}"  # NaN means nothing left the stage
+
+    table_data = [
+        [row['stage'], f"{row['out_per_day']:.1f}", f"{row['mean_wip']:.0f}", row['current_wip'],
+         days(row['dwell_mean']), days(row['dwell_p50']), days(row['dwell_p90'])]
+        for row in report['stages']
+    ]
+
+    print(tabulate(table_data,
+                   headers=["Stage", "Out / day", "Avg WIP", "WIP now",
+                            "Dwell (days)", "Median", "90th pct"],
+                   tablefmt="fancy_outline"))
+
+    if report['bottleneck']:
+        print(f"\nLikely bottleneck: {report['bottleneck']} (longest average dwell time)")
+    print(f"Analysed {report['movements']} movements in {report['seconds']:.2f}s")
+
 def filter_inventory():
 
     filters = {}
@@ -237,21 +394,16 @@ def filter():
     print("3. Size")
     print("4. Done")
 
-    choice = input("\nEnter your choice (1-4): ")
-
-    # Validate input
-    if choice not in ['1', '2', '3', '4']:
-        print("Invalid choice. Please enter 1, 2, 3, or 4.")
-        return filter()  # Ask again
-    
-    return int(choice)
+    return ask_choice(4)
 
 
-def main():
-    """Main program loop."""
+def interactive():
+    """Main program loop for the interactive menus."""
     # Initialize database on startup
     print('\nHello Roopa Enterprises.')
     database.init_database()
+    if config.READ_SNAPSHOT:
+        database.enable_snapshot()
     print('Database ready!')
 
     try:
@@ -263,6 +415,10 @@ def main():
             elif choice == 2:
                 view_mode()
             elif choice == 3:
+                dashboard.run_dashboard()
+            elif choice == 4:
+                backup_mode()
+            elif choice == 5:
                 print("\nGoodbye!")
                 break  # Exit the loop
 
@@ -270,5 +426,240 @@ def main():
         # Handle Ctrl+C gracefully
         print("\n\nProgram interrupted. Goodbye!")
 
+    finally:
+        database.disable_snapshot()
+
+
+# --- Command line and batch mode ----------------------------------------------
+
+class _BatchParser(argparse.ArgumentParser):
+    """
+    Parser for batch file lines: raises ValueError instead of exiting.
+
+    Built without -h/--help (for its subcommands too), so a stray -h in a
+    batch file is reported as a bad line rather than printing help.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs['add_help'] = False
+        super().__init__(*args, **kwargs)
+
+    def error(self, message):
+        raise ValueError(message)
+
+    def exit(self, status=0, message=None):
+        # A batch line must never end the whole run
+        raise ValueError(message.strip() if message else "not an operation")
+
+def _stage(name):
+    """argparse type for a stage stock can be moved from (case-insensitive)."""
+    for stage in config.STAGES[:-1]:
+        if stage.lower() == name.strip().lower():
+            return stage
+    raise argparse.ArgumentTypeError(
+        f"invalid stage '{name}' (choose from {', '.join(config.STAGES[:-1])})"
+    )
+
+def add_commands(parser):
+    """Add the add, move, undo, summary, list and filter subcommands to parser."""
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND')
+
+    add = commands.add_parser('add', help="Add new stock to the Order stage")
+    add.add_argument('quality')
+    add.add_argument('color')
+    add.add_argument('size')
+    add.add_argument('quantity', type=int)
+
+    move = commands.add_parser('move', help="Move stock on to the next stage")
+    move.add_argument('quality')
+    move.add_argument('color')
+    move.add_argument('size')
+    move.add_argument('stage', type=_stage, help="Stage to move from, e.g. 'Raw Made'")
+    move.add_argument('quantity', type=int)
+
+    commands.add_parser('undo', help="Undo the last operation")
+    commands.add_parser('summary', help="Show total quantity per stage")
+    commands.add_parser('list', help="Show all stock")
+
+    filter_parser = commands.add_parser('filter', help="Show stock matching the given attributes")
+    filter_parser.add_argument('--quality')
+    filter_parser.add_argument('--color')
+    filter_parser.add_argument('--size')
+
+def run_command(args):
+    """Run one parsed subcommand."""
+    if args.command == 'add':
+        run_add(args.quality, args.color, args.size, args.quantity)
+
+    elif args.command == 'move':
+        run_move(args.quality, args.color, args.size, args.stage, args.quantity)
+
+    elif args.command == 'undo':
+        run_undo()
+
+    elif args.command == 'summary':
+        display_summary(database.get_stock_summary())
+
+    elif args.command == 'list':
+        display(database.get_all_inventory())
+
+    elif args.command == 'filter':
+        filters = {}
+        for key in ('quality', 'color', 'size'):
+            if getattr(args, key) is not None:
+                filters[key] = getattr(args, key)
+        display(database.filter_inventory(**filters) if filters else database.get_all_inventory())
+
+def run_batch(path, quiet=False, stop_on_error=False):
+    """
+    Run a file of operations, one per line, in this process over one connection.
+
+    Lines are written like the command line, e.g. `move A red M "Raw Made" 50`.
+    Blank lines and lines starting with # are skipped. Each operation is still
+    committed on its own, so a failed line doesn't undo the ones before it.
+
+    Args:
+        path (str): File of operations, or '-' for standard input
+        quiet (bool): Only print errors, not each operation's output
+        stop_on_error (bool): Stop at the first failed operation
+
+    Returns:
+        dict: Per-operation results and totals
+            {
+                'operations': list,  # (line number, command, ok, seconds) per operation
+                'failed': int,
+                'seconds': float     # Wall time for the whole batch
+            }
+    """
+    parser = _BatchParser(prog='batch')
+    add_commands(parser)
+
+    operations = []
+    failed = 0
+    start = time.perf_counter()
+
+    stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    sink = open(os.devnull, 'w') if quiet else sys.stdout
+    database.open_session()
+
+    try:
+        for number, text in enumerate(stream, start=1):
+            text = text.strip()
+            if not text or text.startswith('#'):
+                continue
+
+            op_start = time.perf_counter()
+            try:
+                args = parser.parse_args(shlex.split(text))
+                if args.command is None:
+                    raise ValueError("no command given")
+                with contextlib.redirect_stdout(sink):
+                    run_command(args)
+                ok = True
+            except Exception as e:
+                ok = False
+                failed += 1
+                print(f"✗ Line {number} ({text}): {e}")
+
+            operations.append((number, text.split()[0], ok, time.perf_counter() - op_start))
+
+            if not ok and stop_on_error:
+                break
+
+    finally:
+        database.close_session()
+        if stream is not sys.stdin:
+            stream.close()
+        if quiet:
+            sink.close()
+
+    return {
+        'operations': operations,
+        'failed': failed,
+        'seconds': time.perf_counter() - start
+    }
+
+def write_timings(path, result):
+    """Write each operation of a run_batch() result, with its time, to a CSV file."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['line', 'command', 'ok', 'ms'])
+        for number, command, ok, seconds in result['operations']:
+            writer.writerow([number, command, ok, f"{seconds * 1000:.3f}"])
+
+def display_batch_report(result):
+    """Display operation counts and timings per command for a run_batch() result."""
+    timings = defaultdict(list)
+    failures = defaultdict(int)
+    for _, command, ok, seconds in result['operations']:
+        timings[command].append(seconds)
+        if not ok:
+            failures[command] += 1
+
+    def ms(samples, pct):
+        ordered = sorted(samples)
+        return ordered[int(round(pct / 100 * (len(ordered) - 1)))] * 1000
+
+    table_data = [
+        [command, len(samples), failures[command], sum(samples),
+         sum(samples) / len(samples) * 1000, ms(samples, 50), ms(samples, 95), ms(samples, 100)]
+        for command, samples in timings.items()
+    ]
+
+    print("\n=== Batch Report ===")
+    print(tabulate(table_data,
+                   headers=["Command", "Ops", "Failed", "Total s", "Mean ms",
+                            "p50 ms", "p95 ms", "Max ms"],
+                   tablefmt="fancy_outline", floatfmt=".2f"))
+
+    mark = "✓" if result['failed'] == 0 else "✗"
+    print(f"\n{mark} {len(result['operations'])} operation(s), {result['failed']} failed, "
+          f"in {result['seconds']:.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Sock Factory Inventory Management System. "
+                    "Run without arguments for the interactive menus."
+    )
+    parser.add_argument('--db', help=f"Database to use (default: {config.DB_PATH})")
+    parser.add_argument('--batch', metavar='FILE',
+                        help="Run the operations in FILE, one per line ('-' reads standard input)")
+    parser.add_argument('--quiet', action='store_true',
+                        help="With --batch: only print errors and the timing report")
+    parser.add_argument('--stop-on-error', action='store_true',
+                        help="With --batch: stop at the first failed operation")
+    parser.add_argument('--timings', metavar='FILE',
+                        help="With --batch: write each operation's time to a CSV file")
+    add_commands(parser)
+    args = parser.parse_args()
+
+    if args.db:
+        config.DB_PATH = args.db
+
+    if args.batch and args.command:
+        parser.error("give either a command or --batch, not both")
+
+    if not args.batch and not args.command:
+        interactive()
+        return
+
+    database.init_database()
+
+    if args.command:
+        try:
+            run_command(args)
+        except Exception as e:
+            print(f"\n✗ {e}")
+            sys.exit(1)
+        return
+
+    result = run_batch(args.batch, quiet=args.quiet, stop_on_error=args.stop_on_error)
+    display_batch_report(result)
+    if args.timings:
+        write_timings(args.timings, result)
+        print(f"✓ Timings written to {args.timings}")
+
+    sys.exit(1 if result['failed'] else 0)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
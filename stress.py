@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Concurrent-writer stress test for the Sock Factory Inventory Management System.
+
+Starts N writer processes that run random add_stock, move_stock and
+remove_stock (undo) calls against one shared, freshly created database for
+a fixed time, the same way several terminals would. Every attempt is logged
+by the process that made it. Afterwards the successful operations are
+replayed and the final quantity for every variant and stage must match the
+database exactly. The stock_movements ledger must match as well.
+
+Run with: python3 stress.py --writers 1,2,4,8 --duration 10
+
+Exits with status 1 if any run breaks an invariant.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from tabulate import tabulate
+
+import config
+import database
+
+# Relative weights of each operation in the random mix
+OPERATION_WEIGHTS = {'add': 50, 'move': 45, 'undo': 5}
+
+
+def _error_kind(error):
+    """Classify a failed call as 'busy' (lock contention) or 'rejected' (anything else)."""
+    message = str(error).lower()
+    if 'locked' in message or 'busy' in message:
+        return 'busy'
+    return 'rejected'
+
+def _random_operation(rng, variants):
+    """Run one random operation, return the log entry fields describing its effect."""
+    op = rng.choices(list(OPERATION_WEIGHTS), weights=list(OPERATION_WEIGHTS.values()))[0]
+    n = rng.randrange(variants)
+    quality, color, size = f"Q{n % 3}", f"color{n}", "M"
+
+    if op == 'add':
+        quantity = rng.randint(1, 50)
+        result = database.add_stock(quality, color, size, quantity)
+        return {'op': op, 'variant_id': result['variant_id'],
+                'from_stage': None, 'to_stage': 'Order', 'quantity': quantity}
+
+    if op == 'move':
+        found = database.find_variant_id(quality, color, size)
+        if not found:
+            raise ValueError(f"No variant {quality} {color} {size}")
+        source_stage = rng.choice(config.STAGES[:-1])
+        quantity = rng.randint(1, 20)
+        result = database.move_stock(found[0], source_stage, quantity)
+        return {'op': op, 'variant_id': result['variant_id'],
+                'from_stage': result['source_stage'], 'to_stage': result['destination_stage'],
+                'quantity': result['quantity_moved']}
+
+    result = database.remove_stock()
+    info = result['deleted_info']
+    return {'op': op, 'variant_id': result['variant_id'],
+            'from_stage': info['stage'], 'to_stage': None, 'quantity': info['quantity']}
+
+def _writer(db_path, log_path, duration, variants, seed):
+    """Writer process: run random operations for `duration` seconds, logging each attempt."""
+    config.DB_PATH = db_path
+    rng = random.Random(seed)
+    deadline = time.perf_counter() + duration
+
+    with open(log_path, 'w') as log:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                entry = _random_operation(rng, variants)
+                entry['ok'] = True
+            except Exception as e:
+                entry = {'ok': False, 'error': _error_kind(e)}
+            entry['latency'] = time.perf_counter() - start
+            log.write(json.dumps(entry) + "\n")
+
+def read_logs(log_paths):
+    """Return every logged attempt from all writer logs."""
+    entries = []
+    for path in log_paths:
+        with open(path) as f:
+            entries.extend(json.loads(line) for line in f)
+    return entries
+
+def replay(entries):
+    """
+    Replay successful operations into expected quantities.
+
+    Returns:
+        dict: (variant_id, stage) -> expected quantity (non-zero entries only)
+    """
+    expected = defaultdict(int)
+    for entry in entries:
+        if not entry['ok']:
+            continue
+        if entry['from_stage'] is not None:
+            expected[(entry['variant_id'], entry['from_stage'])] -= entry['quantity']
+        if entry['to_stage'] is not None:
+            expected[(entry['variant_id'], entry['to_stage'])] += entry['quantity']
+
+    return {key: quantity for key, quantity in expected.items() if quantity != 0}
+
+def read_quantities(db_path):
+    """
+    Read actual quantities from the database.
+
+    Returns:
+        tuple: (inventory, ledger) - each a dict of (variant_id, stage) -> quantity
+            (non-zero entries only), from the inventory table and from the
+            net stock_movements per variant and stage
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        inventory = {
+            (variant_id, stage): quantity
+            for variant_id, stage, quantity in conn.execute(
+                "SELECT variant_id, stage, quantity FROM inventory WHERE quantity != 0"
+            )
+        }
+        ledger = {
+            (variant_id, stage): quantity
+            for variant_id, stage, quantity in conn.execute("""
+                SELECT variant_id, stage, SUM(quantity) FROM (
+                    SELECT variant_id, to_stage AS stage, quantity
+                    FROM stock_movements WHERE to_stage IS NOT NULL
+                    UNION ALL
+                    SELECT variant_id, from_stage, -quantity
+                    FROM stock_movements WHERE from_stage IS NOT NULL
+                )
+                GROUP BY variant_id, stage
+                HAVING SUM(quantity) != 0
+            """)
+        }
+        return inventory, ledger
+    finally:
+        conn.close()
+
+def _differences(expected, actual):
+    """Return the keys whose quantities differ between two quantity maps."""
+    return sorted(key for key in set(expected) | set(actual)
+                  if expected.get(key, 0) != actual.get(key, 0))
+
+def _percentile(samples, pct):
+    """Return the pct-th percentile of samples (nearest rank), or 0 if empty."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def run_stress(writers, duration, variants, work_dir):
+    """
+    Run one stress test with `writers` concurrent processes.
+
+    Returns:
+        dict: Throughput, error rates, latency percentiles and invariant results
+    """
+    db_path = os.path.join(work_dir, f'stress-{writers}.db')
+    config.DB_PATH = db_path
+    database.init_database()
+
+    log_paths = [os.path.join(work_dir, f'stress-{writers}-writer{n}.jsonl') for n in range(writers)]
+    procs = [
+        multiprocessing.Process(target=_writer, args=(db_path, log_path, duration, variants, n))
+        for n, log_path in enumerate(log_paths)
+    ]
+
+    start = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    elapsed = time.perf_counter() - start
+
+    entries = read_logs(log_paths)
+    ok = [entry for entry in entries if entry['ok']]
+    busy = sum(1 for entry in entries if not entry['ok'] and entry['error'] == 'busy')
+    latencies = [entry['latency'] for entry in ok]
+
+    expected = replay(entries)
+    inventory, ledger = read_quantities(db_path)
+
+    return {
+        'writers': writers,
+        'attempts': len(entries),
+        'succeeded': len(ok),
+        'ops_per_second': len(ok) / elapsed,
+        'busy_rate': busy / len(entries) if entries else 0.0,
+        'rejected_rate': (len(entries) - len(ok) - busy) / len(entries) if entries else 0.0,
+        'p50': _percentile(latencies, 50),
+        'p95': _percentile(latencies, 95),
+        'p99': _percentile(latencies, 99),
+        'replay_mismatches': _differences(expected, inventory),
+        'ledger_mismatches': _differences(ledger, inventory),
+        'negative': sorted(key for key, quantity in inventory.items() if quantity < 0)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-writer stress test")
+    parser.add_argument('--writers', default='1,2,4,8',
+                        help="Comma-separated writer process counts to run (default: 1,2,4,8)")
+    parser.add_argument('--duration', type=float, default=10.0,
+                        help="Seconds each run lasts (default: 10)")
+    parser.add_argument('--variants', type=int, default=20,
+                        help="Number of sock variants the writers compete over (default: 20)")
+    parser.add_argument('--keep', metavar='DIR',
+                        help="Keep databases and operation logs in DIR instead of a temp folder")
+    args = parser.parse_args()
+
+    writer_counts = [int(n) for n in args.writers.split(',')]
+
+    if args.keep:
+        os.makedirs(args.keep, exist_ok=True)
+        work_dir = args.keep
+        cleanup = None
+    else:
+        cleanup = tempfile.TemporaryDirectory()
+        work_dir = cleanup.name
+
+    try:
+        rows = []
+        failed = False
+        for writers in writer_counts:
+            print(f"Running {writers} writer(s) for {args.duration}s...")
+            result = run_stress(writers, args.duration, args.variants, work_dir)
+
+            invariants_ok = not (result['replay_mismatches'] or result['ledger_mismatches']
+                                 or result['negative'])
+            failed = failed or not invariants_ok
+
+            for label in ('replay_mismatches', 'ledger_mismatches', 'negative'):
+                for variant_id, stage in result[label][:10]:
+                    print(f"  ✗ {label}: variant {variant_id}, stage {stage}")
+
+            rows.append([
+                writers,
+                result['succeeded'],
+                f"{result['ops_per_second']:.0f}",
+                f"{result['busy_rate']:.1%}",
+                f"{result['rejected_rate']:.1%}",
+                f"{result['p50'] * 1000:.1f}",
+                f"{result['p95'] * 1000:.1f}",
+                f"{result['p99'] * 1000:.1f}",
+                "✓" if invariants_ok else "✗"
+            ])
+
+        print(tabulate(rows, headers=["Writers", "Ops", "Ops/s", "Busy", "Rejected",
+                                      "p50 ms", "p95 ms", "p99 ms", "Invariants"],
+                       tablefmt="fancy_outline"))
+    finally:
+        if cleanup is not None:
+            cleanup.cleanup()
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
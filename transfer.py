@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+Bulk export and import of the full inventory for the Sock Factory system.
+
+Copies sock_variants, inventory and stock_movements between databases
+without copying the .db file, e.g. to seed a test machine or move a site's
+data. Rows are streamed a chunk at a time in both directions, so memory use
+stays flat however big the database is.
+
+Two formats:
+- jsonl: one JSON array per row, under a header line per table. Readable and
+  easy to process with other tools. Gzipped if the file name ends in .gz.
+- columnar: compact binary. Each chunk stores column by column (integers
+  and reals as packed 8-byte arrays, text dictionary-encoded),
+  zlib-compressed.
+
+Import runs as one transaction, inserting a chunk at a time with
+executemany, and drops the tables' secondary indexes and triggers for the
+duration, recreating them at the end. A failed import changes nothing.
+
+Run with:
+    python3 transfer.py export FILE [--format jsonl|columnar]
+    python3 transfer.py import FILE [--replace]
+"""
+
+import argparse
+import gzip
+import json
+import sqlite3
+import struct
+import sys
+import time
+import zlib
+from array import array
+
+import config
+import database
+
+# Tables copied, in dependency order
+TABLES = ['sock_variants', 'inventory', 'stock_movements']
+
+# Rows per chunk read, written and inserted at a time
+CHUNK_ROWS = 50000
+
+# Columnar file layout: MAGIC, then blocks of one type byte followed by
+#   b'T' table:  uint32 length + JSON {"table", "columns", "types"}
+#   b'C' chunk:  uint32 row count + uint32 length + zlib-compressed columns
+#   b'E' end of file
+COLUMNAR_MAGIC = b'SOCKCOL1'
+JSONL_FORMAT = 'sockstock-jsonl'
+
+# Column type codes used by the columnar format
+INTEGER, REAL, TEXT = 'i', 'f', 't'
+
+
+def _table_columns(conn, table):
+    """Return [(name, type code)] for table, or None if it doesn't exist."""
+    info = conn.execute(f"PRAGMA table_info({table})").fetchall()
+    if not info:
+        return None
+
+    columns = []
+    for _, name, declared, *_ in info:
+        declared = declared.upper()
+        if 'INT' in declared:
+            columns.append((name, INTEGER))
+        elif 'REAL' in declared or 'FLOA' in declared or 'DOUB' in declared:
+            columns.append((name, REAL))
+        else:
+            columns.append((name, TEXT))
+    return columns
+
+def _chunks(conn, table, columns):
+    """Yield lists of up to CHUNK_ROWS rows from table, in primary key order."""
+    names = ", ".join(name for name, _ in columns)
+    cursor = conn.execute(f"SELECT {names} FROM {table} ORDER BY rowid")
+    while True:
+        rows = cursor.fetchmany(CHUNK_ROWS)
+        if not rows:
+            return
+        yield rows
+
+
+# --- Columnar encoding -------------------------------------------------------
+
+def _packed(typecode, values):
+    """Pack numbers as little-endian machine values."""
+    packed = array(typecode, values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+def _unpacked(typecode, data):
+    """Inverse of _packed()."""
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+def _encode_text(values):
+    """Encode strings (or None) as int32 lengths (-1 for None) plus UTF-8 bytes."""
+    encoded = [None if v is None else str(v).encode('utf-8') for v in values]
+    body = b''.join(e for e in encoded if e is not None)
+    return (_packed('i', [-1 if e is None else len(e) for e in encoded])
+            + struct.pack('<I', len(body)) + body)
+
+def _decode_text(data, offset, count):
+    """Inverse of _encode_text(), returning (values, new offset)."""
+    lengths = _unpacked('i', data[offset:offset + 4 * count])
+    offset += 4 * count
+    (body_length,) = struct.unpack_from('<I', data, offset)
+    offset += 4
+    body = bytes(data[offset:offset + body_length])
+    offset += body_length
+
+    values = []
+    position = 0
+    for length in lengths:
+        if length < 0:
+            values.append(None)
+        else:
+            values.append(body[position:position + length].decode('utf-8'))
+            position += length
+    return values, offset
+
+def _encode_chunk(rows, types):
+    """
+    Encode a chunk of rows column by column, compressed.
+
+    Text columns are dictionary-encoded: the distinct values once, then an
+    int32 code per row. Stage and action columns only have a handful of
+    values, and on import every row shares the same string objects.
+    """
+    parts = []
+    for values, kind in zip(zip(*rows), types):
+        if kind == INTEGER:
+            if None in values:
+                raise ValueError("NULL in an INTEGER column can't be stored in columnar format")
+            parts.append(_packed('q', values))
+        elif kind == REAL:
+            parts.append(_packed('d', values))
+        else:
+            index = {}
+            codes = [index.setdefault(v, len(index)) for v in values]
+            parts.append(struct.pack('<I', len(index)))
+            parts.append(_encode_text(list(index)))
+            parts.append(_packed('i', codes))
+
+    return zlib.compress(b''.join(parts), 1)
+
+def _decode_chunk(payload, count, types):
+    """Decode a chunk written by _encode_chunk() back into a list of rows."""
+    data = memoryview(zlib.decompress(payload))
+    offset = 0
+    columns = []
+
+    for kind in types:
+        if kind in (INTEGER, REAL):
+            size = 8 * count
+            columns.append(_unpacked('q' if kind == INTEGER else 'd', data[offset:offset + size]))
+            offset += size
+        else:
+            (distinct,) = struct.unpack_from('<I', data, offset)
+            values, offset = _decode_text(data, offset + 4, distinct)
+            codes = _unpacked('i', data[offset:offset + 4 * count])
+            offset += 4 * count
+            columns.append(list(map(values.__getitem__, codes)))
+
+    return list(zip(*columns))
+
+
+# --- Export ------------------------------------------------------------------
+
+def _export_jsonl(conn, f):
+    """Write every table as JSON lines, returning rows written per table."""
+    counts = {}
+    f.write(json.dumps({'format': JSONL_FORMAT, 'version': 1}) + "\n")
+
+    for table in TABLES:
+        columns = _table_columns(conn, table)
+        if columns is None:
+            continue
+
+        f.write(json.dumps({'table': table, 'columns': [name for name, _ in columns]}) + "\n")
+        counts[table] = 0
+        for rows in _chunks(conn, table, columns):
+            f.write("\n".join(json.dumps(row, separators=(',', ':')) for row in rows) + "\n")
+            counts[table] += len(rows)
+
+    return counts
+
+def _export_columnar(conn, f):
+    """Write every table in the columnar format, returning rows written per table."""
+    counts = {}
+    f.write(COLUMNAR_MAGIC)
+
+    for table in TABLES:
+        columns = _table_columns(conn, table)
+        if columns is None:
+            continue
+
+        header = json.dumps({
+            'table': table,
+            'columns': [name for name, _ in columns],
+            'types': [kind for _, kind in columns]
+        }).encode('utf-8')
+        f.write(b'T' + struct.pack('<I', len(header)) + header)
+
+        types = [kind for _, kind in columns]
+        counts[table] = 0
+        for rows in _chunks(conn, table, columns):
+            payload = _encode_chunk(rows, types)
+            f.write(b'C' + struct.pack('<II', len(rows), len(payload)) + payload)
+            counts[table] += len(rows)
+
+    f.write(b'E')
+    return counts
+
+def export_database(path, fmt='jsonl'):
+    """
+    Export sock_variants, inventory and stock_movements to a file.
+
+    Everything is read in one transaction, so the export is a consistent
+    copy even while other terminals keep writing.
+
+    Args:
+        path (str): File to write (for jsonl, a .gz name gzips it)
+        fmt (str): 'jsonl' or 'columnar'
+
+    Returns:
+        dict: {'success': True, 'path': str, 'format': str,
+               'rows': {table: int}, 'seconds': float}
+
+    Raises:
+        ValueError: If fmt is not a known format
+
+    Example:
+        >>> export_database('site1.sockcol', fmt='columnar')
+        {'success': True, 'rows': {'sock_variants': 120, 'inventory': 480, ...}, ...}
+    """
+    if fmt not in ('jsonl', 'columnar'):
+        raise ValueError(f"Unknown export format: {fmt} (choose jsonl or columnar)")
+
+    start = time.perf_counter()
+    conn = sqlite3.connect(config.DB_PATH)
+
+    try:
+        conn.execute("BEGIN")  # One read snapshot for all tables
+
+        if fmt == 'columnar':
+            with open(path, 'wb') as f:
+                counts = _export_columnar(conn, f)
+        elif path.endswith('.gz'):
+            with gzip.open(path, 'wt', encoding='utf-8', compresslevel=1) as f:
+                counts = _export_jsonl(conn, f)
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                counts = _export_jsonl(conn, f)
+
+        conn.rollback()  # Nothing was written; just end the read transaction
+
+        return {
+            'success': True,
+            'path': path,
+            'format': fmt,
+            'rows': counts,
+            'seconds': time.perf_counter() - start
+        }
+
+    finally:
+        conn.close()
+
+
+# --- Import ------------------------------------------------------------------
+
+def _read_jsonl(path):
+    """Yield (table, columns, rows) chunks from a jsonl export."""
+    opener = gzip.open if _is_gzip(path) else open
+
+    with opener(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        if header.get('format') != JSONL_FORMAT:
+            raise ValueError(f"{path} is not a sockstock export")
+
+        table = columns = None
+        rows = []
+        for line in f:
+            record = json.loads(line)
+            if isinstance(record, dict):
+                if rows:
+                    yield table, columns, rows
+                    rows = []
+                table, columns = record['table'], record['columns']
+                yield table, columns, []  # Announce the table even if it has no rows
+            else:
+                rows.append(record)
+                if len(rows) >= CHUNK_ROWS:
+                    yield table, columns, rows
+                    rows = []
+
+        if rows:
+            yield table, columns, rows
+
+def _read_columnar(path):
+    """Yield (table, columns, rows) chunks from a columnar export."""
+    with open(path, 'rb') as f:
+        if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+            raise ValueError(f"{path} is not a sockstock columnar export")
+
+        table = columns = types = None
+        while True:
+            kind = f.read(1)
+            if kind == b'T':
+                (length,) = struct.unpack('<I', f.read(4))
+                header = json.loads(f.read(length))
+                table, columns, types = header['table'], header['columns'], header['types']
+                yield table, columns, []
+            elif kind == b'C':
+                count, length = struct.unpack('<II', f.read(8))
+                yield table, columns, _decode_chunk(f.read(length), count, types)
+            elif kind == b'E':
+                return
+            else:
+                raise ValueError(f"{path} is truncated or corrupt")
+
+def _is_gzip(path):
+    with open(path, 'rb') as f:
+        return f.read(2) == b'\x1f\x8b'
+
+def _is_columnar(path):
+    with open(path, 'rb') as f:
+        return f.read(len(COLUMNAR_MAGIC)) == COLUMNAR_MAGIC
+
+def import_database(path, replace=False):
+    """
+    Import an export made by export_database() into config.DB_PATH.
+
+    The format is detected from the file. The whole import is one
+    transaction: the existing rows are deleted (with replace=True) and every
+    chunk is inserted before anything is committed, so a failed or truncated
+    import leaves the database exactly as it was, and other terminals never
+    see it half loaded. Secondary indexes and triggers on the imported tables
+    are dropped first and recreated once every row is in, inside the same
+    transaction. Rows are inserted CHUNK_ROWS at a time.
+
+    Args:
+        path (str): Export file to read
+        replace (bool): Delete the existing inventory first. Without it the
+            target database must be empty.
+
+    Returns:
+        dict: {'success': True, 'path': str, 'format': str,
+               'rows': {table: int}, 'seconds': float}
+
+    Raises:
+        ValueError: If the file isn't a sockstock export, mentions an
+            unknown table or column, or the database already has inventory
+            and replace is False
+
+    Example:
+        >>> import_database('site1.sockcol')
+        {'success': True, 'rows': {'sock_variants': 120, 'inventory': 480, ...}, ...}
+    """
+    start = time.perf_counter()
+    fmt = 'columnar' if _is_columnar(path) else 'jsonl'
+    chunks = _read_columnar(path) if fmt == 'columnar' else _read_jsonl(path)
+
+    database.init_database()
+    conn = sqlite3.connect(config.DB_PATH)
+    cursor = conn.cursor()
+
+    try:
+        # One transaction for everything below: nothing is committed until
+        # every row is in, so a failure rolls back to the original data
+        cursor.execute("BEGIN IMMEDIATE")
+
+        existing = sum(
+            cursor.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in TABLES
+        )
+        if existing and not replace:
+            raise ValueError("Database already has inventory - use replace=True to overwrite it")
+
+        # Set aside secondary indexes and triggers until the data is in (and
+        # before the delete, so it doesn't fire the triggers row by row)
+        placeholders = ", ".join("?" * len(TABLES))
+        deferred = cursor.execute(f"""
+            SELECT type, name, sql FROM sqlite_master
+            WHERE type IN ('index', 'trigger') AND sql IS NOT NULL
+              AND tbl_name IN ({placeholders})
+        """, TABLES).fetchall()
+        for kind, name, _ in deferred:
+            cursor.execute(f"DROP {kind.upper()} {name}")
+
+        for table in TABLES:
+            cursor.execute(f"DELETE FROM {table}")
+        cursor.execute("DROP TABLE IF EXISTS integrity_checks")  # Refers to the old ledger
+
+        counts = _load_chunks(conn, cursor, chunks)
+
+        for _, _, sql in deferred:
+            cursor.execute(sql)
+
+        # Exports from before the ledger existed: open it from current inventory
+        if 'stock_movements' not in counts:
+            cursor.execute("""
+                INSERT INTO stock_movements
+                    (variant_id, from_stage, to_stage, quantity, action, moved_at)
+                SELECT variant_id, NULL, stage, quantity, 'opening', ?
+                FROM inventory
+                WHERE quantity > 0
+                ORDER BY id
+            """, (time.time(),))
+
+        conn.commit()
+
+        return {
+            'success': True,
+            'path': path,
+            'format': fmt,
+            'rows': counts,
+            'seconds': time.perf_counter() - start
+        }
+
+    except Exception as e:
+        # Undoes the delete, the dropped indexes and every chunk loaded so far
+        conn.rollback()
+        raise Exception(f"Failed to import: {e}")
+
+    finally:
+        conn.close()
+
+def _load_chunks(conn, cursor, chunks):
+    """Insert every chunk inside the caller's transaction, returning rows per table."""
+    counts = {}
+    for table, columns, rows in chunks:
+        if table not in TABLES:
+            raise ValueError(f"Unknown table in export: {table}")
+
+        known = {name for name, _ in _table_columns(conn, table)}
+        unknown = [name for name in columns if name not in known]
+        if unknown:
+            raise ValueError(f"Unknown column(s) in {table}: {', '.join(unknown)}")
+
+        counts.setdefault(table, 0)
+        if not rows:
+            continue
+
+        cursor.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})",
+            rows
+        )
+        counts[table] += len(rows)
+
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import the full inventory")
+    parser.add_argument('--db', help=f"Database to use (default: {config.DB_PATH})")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = commands.add_parser('export', help="Write the inventory to a file")
+    export_parser.add_argument('file')
+    export_parser.add_argument('--format', choices=['jsonl', 'columnar'], default='jsonl')
+
+    import_parser = commands.add_parser('import', help="Load the inventory from a file")
+    import_parser.add_argument('file')
+    import_parser.add_argument('--replace', action='store_true',
+                               help="Replace the existing inventory")
+
+    args = parser.parse_args()
+    if args.db:
+        config.DB_PATH = args.db
+
+    try:
+        if args.command == 'export':
+            result = export_database(args.file, fmt=args.format)
+        else:
+            result = import_database(args.file, replace=args.replace)
+    except Exception as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+
+    rows = ", ".join(f"{count} {table}" for table, count in result['rows'].items())
+    print(f"✓ {args.command.capitalize()}ed {rows} ({result['format']}) in {result['seconds']:.2f}s")
+
+if __name__ == "__main__":
+    main()